@@ -0,0 +1,75 @@
+"""Run a prompt suite through the app's models without the UI.
+
+Reads rows lazily from JSONL or CSV (see src/utils/batch.read_rows), sends them through
+APIHandler on a bounded pool that waits for the provider's rate limits, and appends one JSON
+line per row with the response, latency and token usage. Rerunning with the same output file
+skips the rows already written, so an interrupted run resumes where it stopped:
+
+    python batch.py prompts.jsonl results.jsonl --model groq/llama-3.1-8b-instant [--concurrency 4]
+
+API keys are read from the environment (GROQ_API_KEY, GEMINI_API_KEY, ...).
+"""
+import argparse
+import statistics
+import sys
+import time
+from src.utils.batch import BATCH_SETTINGS, BatchRunner, completed_ids, read_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL or CSV file of prompts")
+    parser.add_argument("output", help="JSONL file results are appended to")
+    parser.add_argument("--model", required=True, help="Default model; a row's model field overrides it")
+    parser.add_argument("--temperature", type=float)
+    parser.add_argument("--max-tokens", type=int)
+    parser.add_argument("--system-prompt")
+    parser.add_argument("--concurrency", type=int, default=BATCH_SETTINGS["concurrency"])
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream responses to record time to first token (token usage is then estimated)")
+    parser.add_argument("--allow-cache", action="store_true", help="Reuse cached responses for repeated prompts")
+    parser.add_argument("--keep-errors", action="store_true", help="Do not retry rows that failed in an earlier run")
+    parser.add_argument("--progress-every", type=int, default=50, help="Print progress every N rows")
+    args = parser.parse_args()
+
+    runner = BatchRunner(
+        args.model,
+        temperature=args.temperature,
+        max_tokens=args.max_tokens,
+        system_prompt=args.system_prompt,
+        stream=args.stream,
+        allow_cache=args.allow_cache,
+        concurrency=args.concurrency
+    )
+    skip = completed_ids(args.output, retry_errors=not args.keep_errors)
+    if skip:
+        print(f"Resuming: {len(skip)} rows already in {args.output}")
+
+    start = time.perf_counter()
+
+    def show_progress(record, totals):
+        if totals["written"] % args.progress_every == 0:
+            elapsed = time.perf_counter() - start
+            print(f"{totals['written']} rows ({totals['errors']} errors) in {elapsed:.1f}s, "
+                  f"{totals['written'] / elapsed:.1f} rows/s")
+
+    try:
+        totals = runner.run(read_rows(args.input), args.output, skip, show_progress)
+    except KeyboardInterrupt:
+        print(f"Interrupted; rerun the same command to resume from {args.output}")
+        sys.exit(130)
+
+    elapsed = time.perf_counter() - start
+    print(f"Done: {totals['written']} rows written ({totals['errors']} errors), "
+          f"{totals['skipped']} skipped, in {elapsed:.1f}s")
+    latencies = totals["latencies"]
+    if len(latencies) >= 2:
+        p50, p95 = statistics.median(latencies), statistics.quantiles(latencies, n=20)[-1]
+        print(f"Latency p50 {p50:.2f}s, p95 {p95:.2f}s; "
+              f"{totals['prompt_tokens']:,} prompt and {totals['completion_tokens']:,} completion tokens")
+    if totals["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Measure batched token counting against the per-message loop on a synthetic corpus.
+
+Counts with the exact backend of a tokenizer spec (``DEFAULT_TOKENIZER`` unless ``--tokenizer``
+or ``--model`` picks another) and exits with an error if only the characters-per-token
+estimate is available, since there is no batch path to measure then. Run from the repository
+root:
+
+    python -m bench.batch_counting [--tokenizer cl100k_base | --model groq/llama-3.3-70b-versatile] [--conversations 2000] [--threads 1 4 8]
+
+Thread counts above the number of available cores only add contention. With a HuggingFace
+vocabulary only ``--threads 1`` differs: larger batches run on the library's Rayon pool,
+sized by RAYON_NUM_THREADS.
+"""
+import argparse
+import random
+import sys
+import time
+from bench.tokenizer_backends import make_corpus
+from src.config.models_config import DEFAULT_TOKENIZER, get_model_config
+from src.utils.tokenizer_backends import EstimateBackend, get_backend
+
+
+def make_histories(n_conversations: int, seed: int = 0):
+    """Build saved conversations of alternating user/assistant turns."""
+    rng = random.Random(seed)
+    corpus = make_corpus(512, seed=seed)
+    return [
+        [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": rng.choice(corpus)}
+            for i in range(rng.randint(2, 40))
+        ]
+        for _ in range(n_conversations)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--tokenizer", default=DEFAULT_TOKENIZER, help="Tokenizer spec in TOKENIZER_SPECS")
+    group.add_argument("--model", help="Use this model's tokenizer spec instead")
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    name = get_model_config(args.model).get("tokenizer") if args.model else args.tokenizer
+    backend = get_backend(name)
+    if isinstance(backend, EstimateBackend):
+        sys.exit(f"Tokenizer {backend.name} has no vocabulary or tiktoken encoding available here; "
+                 f"only its characters-per-token estimate would be measured")
+
+    histories = make_histories(args.conversations)
+    # The message format Tokenizer.count_message_tokens and count_conversations count
+    texts = [f"{msg['role']}: {msg['content']}" for messages in histories for msg in messages]
+    print(f"backend: {type(backend).__name__} ({backend.name}), "
+          f"{args.conversations} conversations, {len(texts)} messages")
+
+    start = time.perf_counter()
+    baseline = [backend.count(text) for text in texts]
+    loop_time = time.perf_counter() - start
+    print(f"{'per-message loop':<22}{loop_time * 1000:>10.1f} ms")
+
+    for threads in args.threads:
+        start = time.perf_counter()
+        batched = backend.count_batch(texts, num_threads=threads)
+        batch_time = time.perf_counter() - start
+        assert batched == baseline
+        print(f"{f'batch ({threads} threads)':<22}{batch_time * 1000:>10.1f} ms"
+              f"{loop_time / batch_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Compare chunks/sec of the single-pass StreamChunk normalizer with the old two-layer parsing.
+
+The baseline reproduces what every chunk used to go through: APIHandler built a nested
+delta dict per chunk, then ChatInterface walked a second set of branches over that dict.
+Run from the repository root:
+
+    python -m bench.chunk_normalizer [--chunks 200000] [--repeat 5]
+"""
+import argparse
+import time
+from bench.mock_provider import MockProvider
+from src.utils.chunks import normalize_stream
+
+
+def legacy_parse_chunk(chunk):
+    """APIHandler._parse_chunk before StreamChunk."""
+    content = None
+    reasoning = None
+    thinking_blocks = None
+    if hasattr(chunk, 'choices') and chunk.choices:
+        if hasattr(chunk.choices[0], 'delta'):
+            if hasattr(chunk.choices[0].delta, 'content'):
+                content = chunk.choices[0].delta.content
+            if hasattr(chunk.choices[0].delta, 'reasoning_content'):
+                reasoning = chunk.choices[0].delta.reasoning_content
+            if hasattr(chunk.choices[0].delta, 'thinking_blocks'):
+                thinking_blocks = chunk.choices[0].delta.thinking_blocks
+            if hasattr(chunk.choices[0].delta, 'provider_specific_fields'):
+                provider_fields = chunk.choices[0].delta.provider_specific_fields
+                if provider_fields is not None:
+                    if isinstance(provider_fields, dict):
+                        reasoning = provider_fields.get('reasoning_content', '')
+        elif hasattr(chunk.choices[0], 'text'):
+            content = chunk.choices[0].text
+        elif hasattr(chunk.choices[0], 'content'):
+            content = chunk.choices[0].content
+    elif isinstance(chunk, dict):
+        if 'choices' in chunk and chunk['choices']:
+            if 'delta' in chunk['choices'][0]:
+                delta = chunk['choices'][0]['delta']
+                content = delta.get('content', '')
+                reasoning = delta.get('reasoning_content', '')
+                thinking_blocks = delta.get('thinking_blocks', [])
+                provider_fields = delta.get('provider_specific_fields')
+                if provider_fields is not None:
+                    if isinstance(provider_fields, dict):
+                        reasoning = provider_fields.get('reasoning_content', '')
+            elif 'text' in chunk['choices'][0]:
+                content = chunk['choices'][0]['text']
+            elif 'content' in chunk['choices'][0]:
+                content = chunk['choices'][0]['content']
+        elif 'content' in chunk:
+            content = chunk['content']
+    elif isinstance(chunk, str):
+        content = chunk.strip()
+    elif hasattr(chunk, 'content'):
+        content = chunk.content
+    if content or reasoning or thinking_blocks:
+        return {
+            "choices": [{
+                "delta": {
+                    "content": content if content else "",
+                    "reasoning": reasoning if reasoning else "",
+                    "thinking_blocks": thinking_blocks if thinking_blocks else []
+                }
+            }]
+        }
+    return None
+
+
+def legacy_chat_extract(chunk):
+    """The branch walk ChatInterface ran over each parsed chunk before StreamChunk."""
+    content = None
+    reasoning = None
+    if isinstance(chunk, dict):
+        if 'choices' in chunk:
+            if 'delta' in chunk['choices'][0]:
+                content = chunk['choices'][0]['delta'].get('content', '')
+                reasoning = chunk['choices'][0]['delta'].get('reasoning', '')
+                if 'text' in chunk['choices'][0]:
+                    content = chunk['choices'][0]['text']
+                elif 'message' in chunk['choices'][0]:
+                    content = chunk['choices'][0]['message'].get('content', '')
+                elif 'content' in chunk['choices'][0]:
+                    content = chunk['choices'][0]['content']
+            elif 'content' in chunk:
+                content = chunk['content']
+        elif 'content' in chunk:
+            content = chunk['content']
+    elif isinstance(chunk, str):
+        content = chunk
+    elif hasattr(chunk, 'content'):
+        content = chunk.content
+    return content, reasoning
+
+
+def run_legacy(raw):
+    chars = 0
+    for chunk in raw:
+        parsed = legacy_parse_chunk(chunk)
+        if parsed is not None:
+            content, reasoning = legacy_chat_extract(parsed)
+            chars += len(content or "") + len(reasoning or "")
+    return chars
+
+
+def run_single_pass(raw):
+    chars = 0
+    for chunk in normalize_stream(raw):
+        chars += len(chunk.content) + len(chunk.reasoning)
+    return chars
+
+
+def best_rate(fn, raw, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(raw)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(raw) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'shape':<8}{'before chunks/s':>17}{'after chunks/s':>17}{'speedup':>9}")
+    for shape in ("object", "dict", "str"):
+        raw = MockProvider(text="x" * (args.chunks * 4), chunk_chars=4, reasoning="r" * 4000, shape=shape).chunks()
+        before = best_rate(run_legacy, raw, args.repeat)
+        after = best_rate(run_single_pass, raw, args.repeat)
+        print(f"{shape:<8}{before:>17,.0f}{after:>17,.0f}{after / before:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Compare concurrent-session throughput of the blocking and async provider paths.
+
+Each session runs in its own thread, like a Streamlit script run, and streams one
+response from the local mock provider. Run from the repository root:
+
+    python -m bench.concurrent_sessions [--sessions 50] [--first-token-latency 0.5]
+"""
+import argparse
+import threading
+import time
+from bench.mock_provider import MockProvider
+from src.utils.api_handlers import APIHandler
+
+MODEL = "groq/llama-3.1-8b-instant"
+
+
+def run_sessions(use_async: bool, sessions: int):
+    """Stream one response per session concurrently; return (wall seconds, chunks, peak threads)."""
+    chunks = [0] * sessions
+    peak_threads = [threading.active_count()]
+
+    def session(index: int):
+        handler = APIHandler(MODEL, use_async=use_async)
+        messages = [{"role": "user", "content": f"question {index}"}]
+        for _ in handler.generate_response(messages=messages, temperature=0.7):
+            chunks[index] += 1
+            peak_threads[0] = max(peak_threads[0], threading.active_count())
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, sum(chunks), peak_threads[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--first-token-latency", type=float, default=0.5)
+    parser.add_argument("--chunk-latency", type=float, default=0.002)
+    args = parser.parse_args()
+
+    with MockProvider(first_token_latency=args.first_token_latency, chunk_latency=args.chunk_latency):
+        print(f"{'path':<8}{'wall s':>9}{'sessions/s':>12}{'chunks/s':>12}{'peak threads':>14}")
+        for use_async in (False, True):
+            wall, chunks, peak = run_sessions(use_async, args.sessions)
+            print(f"{'async' if use_async else 'sync':<8}{wall:>9.2f}{args.sessions / wall:>12.1f}"
+                  f"{chunks / wall:>12,.0f}{peak:>14}")
+
+
+if __name__ == "__main__":
+    main()
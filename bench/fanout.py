@@ -0,0 +1,61 @@
+"""Wall time of sending one prompt to several models one after another versus fanned out.
+
+Every model answers through its own APIHandler against the mock provider, with a simulated
+first-token latency and per-chunk delay. Run from the repository root:
+
+    python -m bench.fanout [--models 4] [--latency 0.5]
+"""
+import argparse
+import time
+from bench.mock_provider import MockProvider
+from src.components.comparison import available_models
+from src.utils.api_handlers import APIHandler
+from src.utils.fanout import fan_out
+from src.utils.warmup import start_warmup, wait_for_warmup
+
+MESSAGES = [{"role": "user", "content": "Which of you is fastest?"}]
+
+
+def stream(handler: APIHandler):
+    return handler.generate_response(MESSAGES, temperature=0.7, max_tokens=1000)
+
+
+def consume(handler: APIHandler) -> int:
+    return sum(len(chunk.content) for chunk in stream(handler))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds to the first token")
+    parser.add_argument("--chunk-latency", type=float, default=0.002, help="Seconds between chunks")
+    args = parser.parse_args()
+
+    start_warmup()
+    wait_for_warmup()
+    handlers = [APIHandler(model_name) for model_name in available_models()[:args.models]]
+    with MockProvider(first_token_latency=args.latency, chunk_latency=args.chunk_latency, chunk_chars=40):
+        # The first request per provider sets up its pooled HTTP client
+        for handler in handlers:
+            consume(handler)
+
+        start = time.perf_counter()
+        times = []
+        for handler in handlers:
+            model_start = time.perf_counter()
+            consume(handler)
+            times.append(time.perf_counter() - model_start)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for event in fan_out([lambda handler=handler: stream(handler) for handler in handlers]):
+            if event.error is not None:
+                raise event.error
+        fanned_out = time.perf_counter() - start
+
+    print(f"{'models':>8}{'slowest s':>12}{'sequential s':>15}{'fanned out s':>15}")
+    print(f"{len(handlers):>8}{max(times):>12.2f}{sequential:>15.2f}{fanned_out:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Per-turn cost of APIHandler._format_messages as a conversation grows to 1,000 turns.
+
+Each turn appends a user and an assistant message (with store-style IDs) and formats the
+whole history, once with the incremental format caches and once with them cleared before
+every turn, which is the cost of formatting everything from scratch. Run from the
+repository root:
+
+    python -m bench.format_cache [--turns 1000] [--window 9]
+"""
+import argparse
+import statistics
+import time
+from bench.mock_provider import MockProvider  # noqa: F401  (sets placeholder API keys)
+from src.utils.api_handlers import APIHandler
+
+MODEL = "groq/llama-3.1-8b-instant"
+SYSTEM_PROMPT = "You are a helpful assistant."
+CHECKPOINTS = (10, 100, 250, 500, 1000)
+
+
+def make_message(i: int):
+    return {
+        "id": i + 1,
+        "role": "user" if i % 2 == 0 else "assistant",
+        "content": f"Turn {i}: " + "lorem ipsum dolor sit amet " * 12
+    }
+
+
+def per_turn_costs(turns: int, cached: bool, window: int):
+    """Return {checkpoint turn: median formatting time in µs over the ``window`` turns up to it}."""
+    handler = APIHandler(MODEL)
+    history = []
+    timings = []
+    for _ in range(turns):
+        history.append(make_message(len(history)))
+        history.append(make_message(len(history)))
+        if not cached:
+            handler._format_cache.clear()
+            handler._last_format = None
+        start = time.perf_counter()
+        handler._format_messages(history, SYSTEM_PROMPT)
+        timings.append(time.perf_counter() - start)
+    return {
+        turn: statistics.median(timings[max(turn - window, 0):turn]) * 1e6
+        for turn in CHECKPOINTS if turn <= turns
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--window", type=int, default=9, help="Turns per checkpoint; the median is reported")
+    args = parser.parse_args()
+
+    uncached = per_turn_costs(args.turns, False, args.window)
+    cached = per_turn_costs(args.turns, True, args.window)
+    print(f"{'turn':>6}{'messages':>10}{'from scratch µs':>18}{'cached µs':>12}{'speedup':>10}")
+    for turn in sorted(cached):
+        print(f"{turn:>6}{turn * 2:>10}{uncached[turn]:>18.1f}{cached[turn]:>12.1f}{uncached[turn] / cached[turn]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
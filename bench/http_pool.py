@@ -0,0 +1,54 @@
+"""Check keep-alive connection reuse of the pooled provider clients against a local stub.
+
+Runs real APIHandler turns for a Groq model through LiteLLM, pointed at bench.stub_server,
+and compares the pool's counters with the connections the server actually accepted. Turns
+use a non-zero temperature so the response cache never answers them and every turn reaches
+the server. Run from the repository root:
+
+    python -m bench.http_pool [--turns 50]
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+os.environ.setdefault("GROQ_API_KEY", "stub")
+
+from bench.stub_server import StubServer
+from src.utils.api_handlers import APIHandler
+from src.utils.http_pool import get_pool_stats
+
+MODEL = "groq/llama-3.1-8b-instant"
+
+
+def run_turns(use_async: bool, turns: int):
+    """Run sequential chat turns; return per-turn latencies in seconds."""
+    handler = APIHandler(MODEL, use_async=use_async)
+    latencies = []
+    for i in range(turns):
+        start = time.perf_counter()
+        # Temperature 0 would be served from the response cache on the second pass
+        for _ in handler.generate_response(messages=[{"role": "user", "content": f"turn {i}"}], temperature=0.7):
+            pass
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=50)
+    args = parser.parse_args()
+
+    with StubServer() as server:
+        os.environ["GROQ_API_BASE"] = server.url
+        for use_async in (False, True):
+            accepted_before, requests_before = server.connections, server.requests
+            latencies = sorted(run_turns(use_async, args.turns))
+            stats = get_pool_stats()["groq"]
+            print(f"{'async' if use_async else 'sync':<6} p50 {latencies[len(latencies) // 2] * 1000:6.1f} ms  "
+                  f"server got {server.requests - requests_before} request(s) on "
+                  f"{server.connections - accepted_before} connection(s)  pool stats {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Local stand-in for LiteLLM providers so benchmarks never touch real API quota.
+
+``MockProvider`` replaces ``completion``/``acompletion`` in ``src.utils.api_handlers`` and
+streams chunks in the shapes ``APIHandler`` parses: LiteLLM-style objects with
+``choices[0].delta``, plain dicts, or raw strings. The mock has no quota, so the
+configured provider rate limits are bypassed unless ``rate_limits=True``.
+"""
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+import src.utils.api_handlers as api_handlers
+from src.utils.rate_limiter import RequestScheduler
+
+DEFAULT_TEXT = (
+    "Streaming responses arrive as many small deltas. Each one has to be normalized, "
+    "buffered, counted and eventually rendered as markdown in the chat transcript. "
+)
+
+# Providers check for their key at construction time
+for key in ("GROQ_API_KEY", "REPLICATE_API_KEY", "GEMINI_API_KEY", "OPENROUTER_API_KEY"):
+    os.environ.setdefault(key, "mock")
+
+
+class MockProvider:
+    def __init__(
+        self,
+        text: str = DEFAULT_TEXT * 20,
+        chunk_chars: int = 8,
+        first_token_latency: float = 0.0,
+        chunk_latency: float = 0.0,
+        reasoning: str = "",
+        shape: str = "object",
+        rate_limits: bool = False
+    ):
+        if shape not in ("object", "dict", "str"):
+            raise ValueError(f"Unknown chunk shape {shape}")
+        self.text = text
+        self.chunk_chars = chunk_chars
+        self.first_token_latency = first_token_latency
+        self.chunk_latency = chunk_latency
+        self.reasoning = reasoning
+        self.shape = shape
+        self.rate_limits = rate_limits
+        self.calls = 0
+        self._patched = None
+
+    def _pieces(self, text: str) -> List[str]:
+        return [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+
+    def _make_chunk(self, content: str = "", reasoning: str = "") -> Any:
+        if self.shape == "str":
+            return content or reasoning
+        if self.shape == "dict":
+            return {"choices": [{"delta": {"content": content, "reasoning_content": reasoning}}]}
+        delta = SimpleNamespace(content=content, reasoning_content=reasoning or None)
+        return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+    def chunks(self) -> List[Any]:
+        """Build every chunk of one streamed response up front."""
+        chunks = [self._make_chunk(reasoning=piece) for piece in self._pieces(self.reasoning)]
+        chunks += [self._make_chunk(content=piece) for piece in self._pieces(self.text)]
+        return chunks
+
+    def _full_response(self) -> Any:
+        message = SimpleNamespace(content=self.text, reasoning_content=self.reasoning or None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    def completion(self, **kwargs: Dict[str, Any]) -> Any:
+        """Blocking mock of litellm.completion."""
+        self.calls += 1
+        if not kwargs.get("stream"):
+            time.sleep(self.first_token_latency)
+            return self._full_response()
+
+        def stream():
+            time.sleep(self.first_token_latency)
+            for i, chunk in enumerate(self.chunks()):
+                if i and self.chunk_latency:
+                    time.sleep(self.chunk_latency)
+                yield chunk
+        return stream()
+
+    async def acompletion(self, **kwargs: Dict[str, Any]) -> Any:
+        """Async mock of litellm.acompletion."""
+        self.calls += 1
+        await asyncio.sleep(self.first_token_latency)
+        if not kwargs.get("stream"):
+            return self._full_response()
+
+        async def stream():
+            for i, chunk in enumerate(self.chunks()):
+                if i and self.chunk_latency:
+                    await asyncio.sleep(self.chunk_latency)
+                yield chunk
+        return stream()
+
+    def install(self) -> "MockProvider":
+        """Route APIHandler's provider calls to this mock."""
+        self._patched = (api_handlers.completion, api_handlers.acompletion, api_handlers.get_scheduler)
+        api_handlers.completion = self.completion
+        api_handlers.acompletion = self.acompletion
+        if not self.rate_limits:
+            unlimited = RequestScheduler()
+            api_handlers.get_scheduler = lambda provider, model_name: unlimited
+        return self
+
+    def uninstall(self) -> None:
+        """Restore the real provider calls."""
+        if self._patched:
+            api_handlers.completion, api_handlers.acompletion, api_handlers.get_scheduler = self._patched
+            self._patched = None
+
+    def __enter__(self) -> "MockProvider":
+        return self.install()
+
+    def __exit__(self, *exc_info) -> None:
+        self.uninstall()
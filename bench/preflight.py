@@ -0,0 +1,96 @@
+"""Count the requests a long chat wastes on provider context-length errors, with and without preflight.
+
+Runs real MemoryManager + APIHandler turns through LiteLLM against bench.stub_server, which
+rejects a prompt plus max_tokens longer than the model's context window with a 400, as a
+provider does. The memory budget and max tokens are the sidebar defaults, so the prompt
+eventually crowds out the response. Run from the repository root:
+
+    python -m bench.preflight [--turns 40] [--max-tokens 4000]
+"""
+import argparse
+import logging
+import os
+
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+os.environ.setdefault("GROQ_API_KEY", "stub")
+
+import litellm
+import streamlit as st
+from bench.stub_server import StubServer
+from src.components.memory import MemoryManager
+from src.config.models_config import RATE_LIMITS, get_model_config
+from src.utils.api_handlers import APIHandler, ContextWindowError
+from src.utils.tokenizer_backends import get_backend
+from src.utils.conversation_store import CONVERSATION_STORE_SETTINGS
+
+MODEL = "groq/gemma2-9b-it"
+litellm.suppress_debug_info = True
+# The stub has no rate limits to respect
+RATE_LIMITS["groq"] = {"rpm": None, "tpm": None}
+
+for _name in ("streamlit.runtime.scriptrunner_utils.script_run_context", "streamlit.runtime.state.session_state_proxy"):
+    logging.getLogger(_name).disabled = True
+CONVERSATION_STORE_SETTINGS["backend"] = "memory"
+
+
+def run_chat(server: StubServer, turns: int, max_tokens: int, preflight: bool):
+    """Run the chat turn loop of ChatInterface; return per-run counts."""
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+    # A new conversation, not the previous run's reloaded from the store
+    st.query_params.clear()
+    manager = MemoryManager(MODEL)
+    handler = APIHandler(MODEL, use_async=False)
+    if not preflight:
+        handler.preflight = lambda prompt_tokens, max_tokens: max_tokens
+        handler.prompt_overflow = lambda messages, system_prompt=None: 0
+    requests_before, errors_before = server.requests, server.context_errors
+    counts = {"answered": 0, "rejected": 0, "failed": 0, "clamped": 0, "evicted": 0}
+    for i in range(turns):
+        manager.add_message("user", f"Question {i}: " + "please explain the context window once more " * 20)
+        overflow = handler.prompt_overflow(manager.get_messages())
+        if overflow:
+            counts["evicted"] += manager.make_room(overflow)
+        try:
+            reply = "".join(
+                chunk.content
+                for chunk in handler.generate_response(
+                    manager.get_messages(), temperature=0.5, max_tokens=max_tokens, stream=False
+                )
+            )
+        except ContextWindowError:
+            counts["rejected"] += 1
+            continue
+        except Exception:
+            counts["failed"] += 1
+            continue
+        counts["answered"] += 1
+        counts["clamped"] += handler.last_max_tokens is not None and handler.last_max_tokens < max_tokens
+        manager.add_message("assistant", reply)
+    counts["sent"] = server.requests - requests_before
+    counts["context_errors"] = server.context_errors - errors_before
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--max-tokens", type=int, default=4000)
+    args = parser.parse_args()
+
+    context_length = get_model_config(MODEL)["context_length"]
+    reply = "The context window holds the prompt and the response together. " * 40
+    # The stub counts with the model's tokenizer, as the provider would
+    count_tokens = get_backend(get_model_config(MODEL).get("tokenizer")).count
+    with StubServer(reply=reply, context_length=context_length, count_tokens=count_tokens) as server:
+        os.environ["GROQ_API_BASE"] = server.url
+        print(f"{MODEL}: {context_length:,}-token context, max tokens {args.max_tokens:,}, {args.turns} turns")
+        print(f"{'preflight':<11}{'answered':>10}{'sent':>7}{'400s':>7}{'rejected':>10}{'clamped':>9}{'evicted tok':>13}")
+        for preflight in (False, True):
+            c = run_chat(server, args.turns, args.max_tokens, preflight)
+            print(f"{'on' if preflight else 'off':<11}{c['answered']:>10}{c['sent']:>7}{c['context_errors']:>7}"
+                  f"{c['rejected']:>10}{c['clamped']:>9}{c['evicted']:>13,}")
+
+
+if __name__ == "__main__":
+    main()
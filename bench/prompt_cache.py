@@ -0,0 +1,103 @@
+"""Measure how much of each prompt a provider prefix cache could serve over a long chat.
+
+Runs real MemoryManager + APIHandler turns through LiteLLM against bench.stub_server, which
+reports cached prompt tokens the way an implicit prefix cache would, and compares evicting
+one turn at a time with evicting in blocks (EVICTION_HEADROOM). Also shows where OpenRouter
+requests carry cache_control breakpoints. Run from the repository root:
+
+    python -m bench.prompt_cache [--turns 60] [--memory 2000]
+"""
+import argparse
+import logging
+import os
+
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+for _key in ("GROQ_API_KEY", "OPENROUTER_API_KEY"):
+    os.environ.setdefault(_key, "stub")
+
+import streamlit as st
+from bench.stub_server import StubServer
+import src.components.memory as memory
+from src.components.memory import MemoryManager
+from src.config.models_config import RATE_LIMITS
+from src.utils.api_handlers import APIHandler
+from src.utils.conversation_store import CONVERSATION_STORE_SETTINGS
+from src.utils.metrics import get_metrics
+
+MODEL = "groq/llama-3.1-8b-instant"
+OPENROUTER_MODEL = "openrouter/deepseek/deepseek-r1-0528:free"
+# The stub has no rate limits to respect
+RATE_LIMITS["groq"] = {"rpm": None, "tpm": None}
+
+for _name in ("streamlit.runtime.scriptrunner_utils.script_run_context", "streamlit.runtime.state.session_state_proxy"):
+    logging.getLogger(_name).disabled = True
+CONVERSATION_STORE_SETTINGS["backend"] = "memory"
+
+
+def run_chat(turns: int, memory_tokens: int, headroom: float):
+    """Run a chat that outgrows its memory budget; return (prompt tokens, cached tokens, evictions).
+
+    Evictions counts the messages added that triggered one.
+    """
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+    # A new conversation, not the previous run's reloaded from the store
+    st.query_params.clear()
+    memory.EVICTION_HEADROOM = headroom
+    manager = MemoryManager(MODEL)
+    st.session_state.max_memory_tokens = memory_tokens
+    handler = APIHandler(MODEL, use_async=False)
+    get_metrics().records.clear()
+    evictions = 0
+
+    def add(role, content):
+        nonlocal evictions
+        before = len(st.session_state.messages)
+        manager.add_message(role, content)
+        evictions += len(st.session_state.messages) <= before
+
+    for i in range(turns):
+        add("user", f"Question {i}: " + "tell me more about prompt caching " * 6)
+        # Non-zero temperature keeps the response cache out of the way; non-streamed responses carry usage
+        reply = "".join(
+            chunk.content
+            for chunk in handler.generate_response(manager.get_messages(), temperature=0.5, stream=False)
+        )
+        add("assistant", reply)
+    records = [r for r in get_metrics().snapshot() if r["prompt_tokens"]]
+    return (
+        sum(r["prompt_tokens"] for r in records),
+        sum(r["cached_prompt_tokens"] for r in records),
+        evictions
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--memory", type=int, default=2000, help="Max memory tokens for the chat")
+    args = parser.parse_args()
+
+    default_headroom = memory.EVICTION_HEADROOM
+    print(f"{'eviction':<28}{'prompt tok':>12}{'cached tok':>12}{'cached':>8}{'evictions':>11}")
+    for label, headroom in (("one turn at a time", 0.0), (f"blocks ({default_headroom:.0%} headroom)", default_headroom)):
+        # A fresh stub per run, so its simulated cache holds nothing from the previous chat
+        with StubServer(reply="Prefix caching reuses the provider's work on the unchanged start of a prompt. " * 3) as server:
+            os.environ["GROQ_API_BASE"] = server.url
+            prompt, cached, evictions = run_chat(args.turns, args.memory, headroom)
+        print(f"{label:<28}{prompt:>12,}{cached:>12,}{cached / max(prompt, 1):>8.0%}{evictions:>11}")
+
+    # LiteLLM has no base-URL override for OpenRouter, so inspect the request instead of sending it
+    handler = APIHandler(OPENROUTER_MODEL, use_async=False)
+    messages = [{"role": "user", "content": "first"}, {"role": "assistant", "content": "reply"},
+                {"role": "user", "content": "second"}]
+    request = handler._prepare_request(messages, stream=False)
+    marked = [
+        message["role"] for message in request["messages"]
+        if isinstance(message["content"], list) and any("cache_control" in part for part in message["content"])
+    ]
+    print(f"OpenRouter cache_control breakpoints: {', '.join(marked) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Headless end-to-end benchmark of the chat path against the local mock provider.
+
+Stages: prompt formatting, chunk normalization (per chunk shape), memory add/truncate,
+conversation store writes, transcript reruns (full and windowed), and a full
+ChatInterface turn including rendering. Each stage reports wall time and peak Python
+memory (tracemalloc). No API keys or network access are needed; run from the
+repository root:
+
+    python -m bench.run [--turns 1000] [--chunks 5000] [--repeat 3] [--json]
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from bench.mock_provider import MockProvider
+import streamlit as st
+from src.components.chat import HISTORY_WINDOW, ChatInterface
+from src.components.memory import MemoryManager
+from src.utils.api_handlers import APIHandler
+from src.utils.chunks import normalize_stream
+from src.utils.conversation_store import CONVERSATION_STORE_SETTINGS, SQLiteConversationStore
+from src.utils.warmup import start_warmup, wait_for_warmup
+
+MODEL = "groq/llama-3.1-8b-instant"
+
+# Streamlit warns about the missing script run context on every call in bare mode, and
+# resets logger levels when it reads its config, so disable those loggers outright
+for _name in ("streamlit.runtime.scriptrunner_utils.script_run_context", "streamlit.runtime.state.session_state_proxy"):
+    logging.getLogger(_name).disabled = True
+# Keep benchmark conversations out of the on-disk store
+CONVERSATION_STORE_SETTINGS["backend"] = "memory"
+
+
+def make_history(turns: int):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"Turn {i}: " + "lorem ipsum dolor sit amet " * 12}
+        for i in range(turns)
+    ]
+
+
+def measure(name: str, setup, units: int, unit: str, repeat: int = 3):
+    """Run the callable returned by setup() ``repeat`` times and keep the fastest run.
+
+    Setup runs outside the timed region so each repetition starts from fresh state; peak
+    memory is what tracemalloc saw during the fastest run.
+    """
+    best = None
+    for _ in range(repeat):
+        fn = setup()
+        tracemalloc.start()
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if best is None or elapsed < best[0]:
+            best = (elapsed, peak)
+    elapsed, peak = best
+    return {
+        "stage": name,
+        "seconds": elapsed,
+        "per_unit_us": elapsed / units * 1e6,
+        "unit": unit,
+        "throughput": units / elapsed,
+        "peak_kib": peak / 1024
+    }
+
+
+def reset_session():
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+
+
+def bench_format(turns: int, repeat: int):
+    history = make_history(turns)
+
+    def setup():
+        # A fresh handler each run, so this times formatting from scratch (see bench.format_cache)
+        handler = APIHandler(MODEL)
+        return lambda: handler._format_messages(history, "You are helpful.")
+    return measure(f"format_messages ({turns} turns)", setup, turns, "message", repeat)
+
+
+def bench_normalize(chunks: int, shape: str, repeat: int):
+    mock = MockProvider(text="x" * (chunks * 4), chunk_chars=4, reasoning="r" * 400, shape=shape)
+    raw = mock.chunks()
+
+    def run():
+        for _ in normalize_stream(raw):
+            pass
+    return measure(f"normalize chunks ({shape})", lambda: run, len(raw), "chunk", repeat)
+
+
+def bench_memory(turns: int, repeat: int):
+    history = make_history(turns)
+
+    def setup():
+        reset_session()
+        manager = MemoryManager(MODEL)
+        st.session_state.max_memory_tokens = 20000
+
+        def run():
+            for msg in history:
+                manager.add_message(msg["role"], msg["content"])
+        return run
+    return measure(f"memory add+truncate ({turns} msgs)", setup, turns, "message", repeat)
+
+
+def bench_store(turns: int, repeat: int):
+    history = make_history(turns)
+    directory = tempfile.mkdtemp()
+
+    def setup():
+        store = SQLiteConversationStore(os.path.join(directory, f"{time.monotonic_ns()}.db"))
+
+        def run():
+            for msg in history:
+                store.append("bench", {**msg, "tokens": 80}, "cl100k_base")
+            # Reopening a conversation reads one page, not the whole history
+            store.load_recent("bench", CONVERSATION_STORE_SETTINGS["recent_messages"], "cl100k_base")
+        return run
+    try:
+        return measure(f"sqlite store append+load ({turns} msgs)", setup, turns, "message", repeat)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_history(turns: int, window: int, repeat: int):
+    reset_session()
+    chat = ChatInterface(MODEL)
+    st.session_state.max_memory_tokens = 10 ** 9
+    for msg in make_history(turns):
+        chat.memory_manager.add_message(msg["role"], msg["content"])
+
+    def setup():
+        st.session_state.history_window = window
+        return chat._render_history
+    label = "all" if window >= turns else f"last {window}"
+    return measure(f"history rerun ({turns} msgs, {label})", setup, turns, "message", repeat)
+
+
+def bench_chat_turn(chunks: int, history_turns: int, repeat: int):
+    chats = []
+
+    def setup():
+        reset_session()
+        chat = ChatInterface(MODEL)
+        for msg in make_history(history_turns):
+            chat.memory_manager.add_message(msg["role"], msg["content"])
+        st.session_state.model_config = {"model_name": MODEL, "provider": "groq", "temperature": 0.5, "max_tokens": 1000}
+        chats.append(chat)
+        return lambda: chat._handle_user_input("benchmark question")
+
+    # The app loads LiteLLM in the background after the first paint; keep that import out of the turn
+    start_warmup()
+    wait_for_warmup()
+    with MockProvider(text="word " * chunks, chunk_chars=5, reasoning="thinking " * 20):
+        result = measure(f"chat turn ({chunks} chunks, render)", setup, chunks, "chunk", repeat)
+    # ChatInterface reports errors in the UI, which is invisible here
+    for chat in chats:
+        if chat.memory_manager.get_messages()[-1]["role"] != "assistant":
+            raise RuntimeError("Chat turn produced no assistant message")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the fastest is reported")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines")
+    args = parser.parse_args()
+
+    results = [bench_format(args.turns, args.repeat)]
+    for shape in ("object", "dict", "str"):
+        results.append(bench_normalize(args.chunks, shape, args.repeat))
+    results.append(bench_memory(args.turns, args.repeat))
+    results.append(bench_store(args.turns, args.repeat))
+    results.append(bench_history(args.turns, args.turns, args.repeat))
+    results.append(bench_history(args.turns, HISTORY_WINDOW, args.repeat))
+    results.append(bench_chat_turn(args.chunks, min(args.turns, 200), args.repeat))
+
+    if args.json:
+        for row in results:
+            print(json.dumps(row))
+        return
+    print(f"{'stage':<42}{'total ms':>10}{'µs/unit':>10}{'units/s':>12}{'peak KiB':>10}")
+    for row in results:
+        print(f"{row['stage']:<42}{row['seconds'] * 1000:>10.1f}{row['per_unit_us']:>10.2f}"
+              f"{row['throughput']:>12,.0f}{row['peak_kib']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Cold-start import time of the Streamlit entry point, from ``python -X importtime``.
+
+Imports everything ``streamlit_app.py`` imports in a fresh interpreter, reports the
+total and the slowest modules, and fails when a module that must stay lazy (LiteLLM,
+tiktoken) is imported eagerly or the total exceeds ``--max-ms``. Run from the
+repository root:
+
+    python -m bench.startup [--repeat 3] [--top 15] [--max-ms 1500] [--json]
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+
+# Modules imported by streamlit_app.py
+ENTRY_IMPORTS = (
+    "streamlit",
+    "src.components.session_cache",
+    "src.components.metrics_panel",
+    "src.utils.rerun_profiler",
+    "src.utils.warmup"
+)
+
+# Heavy modules that must only load on first use or in the background warm-up
+LAZY_MODULES = ("litellm", "tiktoken", "tokenizers", "openai")
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure_imports():
+    """Import the entry point in a fresh interpreter; return (self_us, cumulative_us, depth) per module."""
+    code = "; ".join(f"import {name}" for name in ENTRY_IMPORTS)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Entry point import failed:\n{result.stderr[-2000:]}")
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return modules
+
+
+def summarize(modules, top: int):
+    """Total import time and the slowest top-level-ish modules by cumulative time."""
+    total_us = sum(cumulative for _, cumulative, depth in modules.values() if depth == 0)
+    slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:top]
+    eager = sorted(
+        name for name in modules
+        if name.split(".")[0] in LAZY_MODULES
+    )
+    return {
+        "total_ms": total_us / 1000,
+        "modules": len(modules),
+        "slowest": [
+            {"module": name, "self_ms": self_us / 1000, "cumulative_ms": cumulative_us / 1000}
+            for name, (self_us, cumulative_us, _) in slowest
+        ],
+        "eager_lazy_modules": eager
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters to run; the fastest is reported")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail when the total import time exceeds this")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    runs = [summarize(measure_imports(), args.top) for _ in range(max(args.repeat, 1))]
+    result = min(runs, key=lambda run: run["total_ms"])
+
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print(f"Entry point imports: {result['total_ms']:.0f} ms across {result['modules']} modules "
+              f"(best of {len(runs)})")
+        print(f"{'module':<60}{'self ms':>10}{'cum ms':>10}")
+        for row in result["slowest"]:
+            print(f"{row['module']:<60}{row['self_ms']:>10.1f}{row['cumulative_ms']:>10.1f}")
+
+    failures = []
+    if result["eager_lazy_modules"]:
+        roots = sorted({name.split(".")[0] for name in result["eager_lazy_modules"]})
+        failures.append(f"imported eagerly: {', '.join(roots)}")
+    if args.max_ms is not None and result["total_ms"] > args.max_ms:
+        failures.append(f"{result['total_ms']:.0f} ms exceeds the {args.max_ms:.0f} ms budget")
+    if failures:
+        print("Startup regression - " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
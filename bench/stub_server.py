@@ -0,0 +1,145 @@
+"""Local OpenAI-compatible HTTP stub that streams chat completion chunks over keep-alive.
+
+Point a provider at it with e.g. ``GROQ_API_BASE=http://127.0.0.1:<port>`` so the real
+LiteLLM request path runs without network access or API quota. Usage reports simulate a
+provider prefix cache: prompt tokens are counted with ``count_tokens`` (characters / 4 by
+default), and the longest run of leading messages already seen in an earlier request counts
+as cached. With ``context_length`` set, a prompt plus ``max_tokens`` that exceeds it gets a
+400 context-length error, as from a real provider.
+"""
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+
+def _text(message) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content)
+    return content
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.last_body = body
+            usage = self.server.usage_for(body.get("messages", []))
+            context_length = self.server.context_length
+            overflow = context_length is not None and usage["prompt_tokens"] + (body.get("max_tokens") or 0) > context_length
+            if overflow:
+                self.server.context_errors += 1
+        time.sleep(self.server.latency)
+        if overflow:
+            payload = json.dumps({"error": {
+                "message": f"This model's maximum context length is {context_length} tokens. However, you "
+                           f"requested {usage['prompt_tokens'] + body['max_tokens']} tokens. Please reduce the length "
+                           "of the messages or completion.",
+                "type": "invalid_request_error",
+                "code": "context_length_exceeded"
+            }}).encode()
+            self.send_response(400)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        words = self.server.reply.split(" ")
+        usage["completion_tokens"] = len(words)
+        usage["total_tokens"] = usage["prompt_tokens"] + len(words)
+        if body.get("stream"):
+            events = []
+            for word in words:
+                chunk = {
+                    "id": "stub", "object": "chat.completion.chunk", "created": 0, "model": body.get("model", ""),
+                    "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]
+                }
+                events.append(f"data: {json.dumps(chunk)}\n\n")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                chunk = {"id": "stub", "object": "chat.completion.chunk", "created": 0,
+                         "model": body.get("model", ""), "choices": [], "usage": usage}
+                events.append(f"data: {json.dumps(chunk)}\n\n")
+            events.append("data: [DONE]\n\n")
+            payload = "".join(events).encode()
+            content_type = "text/event-stream"
+        else:
+            payload = json.dumps({
+                "id": "stub", "object": "chat.completion", "created": 0, "model": body.get("model", ""),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": self.server.reply},
+                             "finish_reason": "stop"}],
+                "usage": usage
+            }).encode()
+            content_type = "application/json"
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        reply: str = "hello from the stub server",
+        latency: float = 0.0,
+        port: int = 0,
+        context_length: int = None,
+        count_tokens: Callable[[str], int] = None
+    ):
+        super().__init__(("127.0.0.1", port), _StubHandler)
+        self.reply = reply
+        self.latency = latency
+        self.context_length = context_length
+        # Prompt tokens per message text; about four characters per token unless a tokenizer is given
+        self.count_tokens = count_tokens or (lambda text: len(text) // 4)
+        self.context_errors = 0
+        self.requests = 0
+        self.connections = 0
+        self.last_body = None
+        self.lock = threading.Lock()
+        self._seen_prefixes = set()
+
+    def usage_for(self, messages) -> dict:
+        """Prompt and cached-prefix token counts for a request, remembering its prefixes."""
+        prefix = hashlib.sha256()
+        prompt_tokens = 0
+        cached_tokens = 0
+        for message in messages:
+            prefix.update(json.dumps([message.get("role"), _text(message)]).encode())
+            prompt_tokens += self.count_tokens(_text(message))
+            key = prefix.hexdigest()
+            if key in self._seen_prefixes:
+                cached_tokens = prompt_tokens
+            self._seen_prefixes.add(key)
+        return {"prompt_tokens": prompt_tokens, "prompt_tokens_details": {"cached_tokens": cached_tokens}}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self) -> "StubServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+        self.server_close()
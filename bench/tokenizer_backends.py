@@ -0,0 +1,62 @@
+"""Compare token-counting throughput across the configured tokenizer backends.
+
+Run from the repository root:
+
+    python -m bench.tokenizer_backends [--messages 5000]
+
+Exact backends are only measured when their vocabulary can be loaded locally; the
+measured characters-per-token ratio can be used to recalibrate ``TOKENIZER_SPECS``. A spec
+whose vocabulary is missing reports its tiktoken fallback, which is not the model's own ratio.
+"""
+import argparse
+import random
+import time
+from src.config.models_config import TOKENIZER_SPECS
+from src.utils.tokenizer_backends import EstimateBackend, get_backend
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog memory token context window model "
+    "response stream provider latency cache summary conversation assistant user "
+    "def return import class 1234 3.14 https://example.com/path?q=1 naïve café 東京"
+).split()
+
+
+def make_corpus(n_messages: int, seed: int = 0):
+    """Build a synthetic chat corpus with a realistic spread of message lengths."""
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 400)))
+        for _ in range(n_messages)
+    ]
+
+
+def bench_backend(backend, corpus):
+    """Return (messages/sec, tokens/sec, chars/token) for one backend."""
+    start = time.perf_counter()
+    tokens = sum(backend.count(text) for text in corpus)
+    elapsed = time.perf_counter() - start
+    chars = sum(len(text) for text in corpus)
+    return len(corpus) / elapsed, tokens / elapsed, chars / max(tokens, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=5000)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.messages)
+    print(f"{'tokenizer':<14}{'backend':<22}{'msgs/s':>12}{'tokens/s':>14}{'chars/tok':>11}")
+    for name, spec in TOKENIZER_SPECS.items():
+        candidates = [get_backend(name)]
+        if not isinstance(candidates[0], EstimateBackend):
+            candidates.append(EstimateBackend(name, spec["chars_per_token"]))
+        for backend in candidates:
+            msgs_per_s, tokens_per_s, chars_per_token = bench_backend(backend, corpus)
+            print(
+                f"{name:<14}{type(backend).__name__:<22}"
+                f"{msgs_per_s:>12,.0f}{tokens_per_s:>14,.0f}{chars_per_token:>11.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
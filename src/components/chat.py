@@ -1,8 +1,18 @@
 import streamlit as st
-import time
-from typing import Dict, Any, Generator, Tuple
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Generator, Tuple
+from ..utils.think_parser import THINK_OPEN, ThinkTagParser
 from ..utils.api_handlers import APIHandler
+from ..utils.rerun_profiler import profile_section
 from .memory import MemoryManager
+from .stream_renderer import StreamRenderer
+
+# Messages rendered on each rerun, and how many more each "show earlier" click adds
+HISTORY_WINDOW = 20
+HISTORY_PAGE = 20
+# Prepared (reasoning, body) pairs kept per message ID
+RENDER_CACHE_SIZE = 500
 
 class ChatInterface:
     def __init__(self, model_name: str):
@@ -18,20 +28,25 @@ class ChatInterface:
             st.session_state.thinking_tokens = 0
         if "response_tokens" not in st.session_state:
             st.session_state.response_tokens = 0
+        if "session_id" not in st.session_state:
+            # Identifies this browser session to the fair request scheduler
+            st.session_state.session_id = uuid.uuid4().hex
+        if "history_window" not in st.session_state:
+            st.session_state.history_window = HISTORY_WINDOW
+        if "render_cache" not in st.session_state:
+            st.session_state.render_cache = OrderedDict()
 
-    def _extract_thinking_phase(self, text: str) -> Tuple[str, str]:
-        """Extract thinking phase and response from text."""
-        thinking = ""
-        response = text
-
-        if "<think>" in text and "</think>" in text:
-            start_idx = text.find("<think>") + len("<think>")
-            end_idx = text.find("</think>")
-            if start_idx < end_idx:
-                thinking = text[start_idx:end_idx].strip()
-                response = text[end_idx + len("</think>"):].strip()
+    def _token_summary(self) -> str:
+        """Format the thinking/response token counts of the current turn."""
+        summary = f"💭 Response: {st.session_state.response_tokens} tokens"
+        if st.session_state.thinking_tokens:
+            summary = f"🧠 Thinking: {st.session_state.thinking_tokens} tokens · " + summary
+        return summary
 
-        return thinking, response
+    def _make_thinking_renderer(self, container: Any, count_tokens: Callable[[str], int], start_time: float) -> StreamRenderer:
+        """Create the collapsed reasoning expander and a renderer that flushes into it less often."""
+        expander = container.container().expander("🧠 Reasoning", expanded=False)
+        return StreamRenderer(expander.empty(), count_tokens, flush_interval=0.25, flush_chars=1000, start_time=start_time)
 
     def render(self):
         """Render the chat interface."""
@@ -40,17 +55,65 @@ class ChatInterface:
         with col2:
             if st.button("Clear Chat 🗑️", use_container_width=True):
                 self.memory_manager.clear_messages()
+                st.session_state.history_window = HISTORY_WINDOW
                 st.rerun()
 
-        # Display chat messages
-        for message in self.memory_manager.get_messages():
-            with st.chat_message(message["role"]):
-                st.markdown(message["content"])
+        # Only the transcript reruns when its own controls are used
+        st.fragment(self._render_history)()
 
         # Chat input
-        if prompt := st.chat_input(disabled=st.session_state.is_processing):
+        with profile_section("chat input"):
+            prompt = st.chat_input(disabled=st.session_state.is_processing)
+        if prompt:
             self._handle_user_input(prompt)
 
+    def _render_history(self):
+        """Render the most recent messages, with a control that pages earlier ones in."""
+        with profile_section("history render"):
+            self._render_history_window()
+
+    def _render_history_window(self):
+        history = self.memory_manager.get_history()
+        window = st.session_state.history_window
+        hidden = max(len(history) - window, 0)
+        if hidden or self.memory_manager.has_earlier_messages():
+            label = f"Show earlier messages ({hidden} hidden)" if hidden else "Show earlier messages"
+            if st.button(label, key="show_earlier_messages"):
+                st.session_state.history_window += HISTORY_PAGE
+                if hidden < HISTORY_PAGE and self.memory_manager.has_earlier_messages():
+                    self.memory_manager.load_earlier_messages()
+                st.rerun(scope="fragment")
+
+        for message in history[-window:] if hidden else history:
+            reasoning, body = self._prepare_message(message)
+            with st.chat_message(message["role"]):
+                if reasoning:
+                    with st.expander("🧠 Reasoning", expanded=False):
+                        st.markdown(reasoning)
+                st.markdown(body)
+
+    def _prepare_message(self, message: Dict[str, Any]) -> Tuple[str, str]:
+        """Split a stored message into (reasoning, body) for display, cached by message ID."""
+        cache = st.session_state.render_cache
+        message_id = message.get("id")
+        if message_id in cache:
+            cache.move_to_end(message_id)
+            return cache[message_id]
+
+        reasoning, body = "", message["content"]
+        if message["role"] == "assistant" and THINK_OPEN in body:
+            # Replies saved with inline <think> blocks show them collapsed like live reasoning
+            parser = ThinkTagParser()
+            thinking, response = parser.feed(body)
+            rest_thinking, rest_response = parser.flush()
+            reasoning, body = (thinking + rest_thinking).strip(), (response + rest_response).strip()
+
+        if message_id is not None:
+            cache[message_id] = (reasoning, body)
+            while len(cache) > RENDER_CACHE_SIZE:
+                cache.popitem(last=False)
+        return reasoning, body
+
     def _handle_user_input(self, prompt: str):
         """Handle user input and generate response."""
         # Add user message to chat
@@ -69,13 +132,6 @@ class ChatInterface:
                 response_container = st.empty()
                 error_container = st.empty()
                 
-                start_time = time.time()
-                full_response = ""
-                thinking_buffer = ""
-                displayed_response = ""
-                thinking_phase = ""
-                is_thinking = False  # Default to not thinking unless we see <think>
-                end_tag_buffer = ""
                 has_received_content = False
                 
                 # Get model configuration from session state
@@ -86,76 +142,94 @@ class ChatInterface:
                 # Reset token counters
                 st.session_state.thinking_tokens = 0
                 st.session_state.response_tokens = 0
-                
+
+                # Coalesce chunks so each flush re-renders once instead of once per chunk
+                count_tokens = self.memory_manager.tokenizer.count_tokens
+                renderer = StreamRenderer(response_container, count_tokens)
+                # Reasoning goes to a collapsed expander created on its first token
+                thinking_renderer = None
+                think_parser = ThinkTagParser()
+
+                def write_thinking(text: str) -> bool:
+                    nonlocal thinking_renderer
+                    if thinking_renderer is None:
+                        thinking_renderer = self._make_thinking_renderer(
+                            thinking_container, count_tokens, renderer.start_time
+                        )
+                    return thinking_renderer.write(text)
+
+                def show_progress():
+                    st.session_state.thinking_tokens = thinking_renderer.tokens if thinking_renderer else 0
+                    st.session_state.response_tokens = renderer.tokens
+                    token_container.markdown(self._token_summary())
+
                 try:
+                    # Preflight: drop old turns now rather than after the provider rejects the prompt
+                    overflow = self.api_handler.prompt_overflow(
+                        self.memory_manager.get_messages(), model_config.get("system_prompt")
+                    )
+                    evicted = self.memory_manager.make_room(overflow) if overflow else 0
+
                     # Generate response
                     for chunk in self.api_handler.generate_response(
                         messages=self.memory_manager.get_messages(),
                         temperature=model_config.get("temperature"),
                         max_tokens=model_config.get("max_tokens"),
-                        system_prompt=model_config.get("system_prompt")
+                        system_prompt=model_config.get("system_prompt"),
+                        allow_cache=model_config.get("allow_cache", False),
+                        session_id=st.session_state.session_id,
+                        routing=model_config.get("routing", "single"),
+                        hedge_after=model_config.get("hedge_after"),
+                        on_queued=lambda position, waited: timer_container.markdown(
+                            f"⏳ Queued (position {position}) · waiting {waited:.1f}s"
+                        )
                     ):
-                        # Extract content from different response formats
-                        content = None
-                        reasoning = None
-                        if isinstance(chunk, dict):
-                            if 'choices' in chunk:
-                                if 'delta' in chunk['choices'][0]:
-                                    content = chunk['choices'][0]['delta'].get('content', '')
-                                    reasoning = chunk['choices'][0]['delta'].get('reasoning', '')
-                                    if 'text' in chunk['choices'][0]:
-                                        content = chunk['choices'][0]['text']
-                                    elif 'message' in chunk['choices'][0]:
-                                        content = chunk['choices'][0]['message'].get('content', '')
-                                    elif 'content' in chunk['choices'][0]:
-                                        content = chunk['choices'][0]['content']
-                                elif 'content' in chunk:
-                                    content = chunk['content']
-                            elif 'content' in chunk:
-                                content = chunk['content']
-                        elif isinstance(chunk, str):
-                            content = chunk
-                        elif hasattr(chunk, 'content'):
-                            content = chunk.content
+                        # Split inline <think> blocks (DeepSeek R1, QwQ) out of the content
+                        thinking, content = think_parser.feed(chunk.content) if chunk.content else ("", "")
+                        reasoning = chunk.reasoning + thinking
 
                         if content or reasoning:
                             has_received_content = True
-                            if reasoning:
-                                full_response += f"\n\nReasoning:\n{reasoning}\n\nResponse:\n"
-                            full_response += content
-                            displayed_response += content
-                            
-                            # Display reasoning if available
-                            if reasoning:
-                                with thinking_container:
-                                    st.markdown(f"""
-                                    <div style='background-color: #f0f2f6; padding: 1rem; border-radius: 0.5rem; margin: 0.5rem 0;'>
-                                        <div style='color: #666; font-style: italic;'>
-                                            {reasoning}
-                                        </div>
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                            
-                            # Display the response
-                            response_container.markdown(
-                                displayed_response,
-                                unsafe_allow_html=True
-                            )
-                            st.session_state.response_tokens = len(displayed_response.split())
-                            
-                            # Update elapsed time and token counts
-                            elapsed_time = time.time() - start_time
-                            timer_container.markdown(f"⏱️ {elapsed_time:.1f}s")
-                            token_container.markdown(
-                                f"💭 Response: {st.session_state.response_tokens} tokens"
-                            )
-                    
+
+                        flushed = write_thinking(reasoning) if reasoning else False
+                        # Buffer the response and refresh widgets only when it flushes
+                        if renderer.write(content) or flushed:
+                            timer_container.markdown(f"⏱️ {renderer.elapsed:.1f}s")
+                            show_progress()
+
+                    # A partial tag held back at the very end is plain text after all
+                    thinking, content = think_parser.flush()
+                    if thinking:
+                        write_thinking(thinking)
+                    if content:
+                        has_received_content = True
+                        renderer.write(content)
+
                     # Final update - only if we've received any content
                     if has_received_content:
-                        final_response = displayed_response.strip()
+                        final_response = renderer.finish()
+                        ttft = renderer.time_to_first_token
+                        if thinking_renderer is not None:
+                            thinking_renderer.finish()
+                            ttft = min(ttft, thinking_renderer.time_to_first_token) if ttft is not None \
+                                else thinking_renderer.time_to_first_token
+                        show_progress()
+                        timer_container.markdown(
+                            f"⏱️ {renderer.elapsed:.1f}s"
+                            + (f" · first token {ttft:.2f}s" if ttft is not None else "")
+                            + f" · final render {renderer.final_render_time * 1000:.0f} ms"
+                        )
+                        if self.api_handler.last_served_by != self.api_handler.model_name:
+                            st.caption(f"Served by {self.api_handler.last_served_by}")
+                        if evicted:
+                            st.caption(f"Dropped {evicted:,} tokens of older turns to fit the context window")
+                        requested_max_tokens = model_config.get("max_tokens")
+                        if requested_max_tokens and self.api_handler.last_max_tokens < requested_max_tokens:
+                            st.caption(
+                                f"Max tokens lowered to {self.api_handler.last_max_tokens:,} "
+                                "to fit the context window"
+                            )
                         if final_response:
-                            # Display final response without cursor
-                            response_container.markdown(final_response)
                             # Add to memory
                             self.memory_manager.add_message("assistant", final_response)
                         else:
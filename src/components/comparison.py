@@ -0,0 +1,243 @@
+import os
+import time
+import streamlit as st
+from typing import Any, Dict, List, Optional
+from ..config.models_config import MODEL_INDEX, get_model_config
+from ..utils.api_handlers import APIHandler
+from ..utils.fanout import fan_out
+from ..utils.think_parser import ThinkTagParser
+from ..utils.tokenizer_backends import get_backend
+from .stream_renderer import StreamRenderer
+
+# Models one prompt can be sent to at once, and finished comparisons kept on screen
+MAX_COMPARED_MODELS = 4
+COMPARISON_HISTORY = 10
+
+
+def available_models() -> List[str]:
+    """Chat models across all providers whose API key is configured."""
+    return [
+        model_id for model_id, config in MODEL_INDEX.items()
+        if config.get("is_instruction") and os.environ.get(f"{config['provider'].upper()}_API_KEY")
+    ]
+
+
+def _model_label(model_name: str) -> str:
+    config = get_model_config(model_name)
+    return f"{config['name']} · {config['provider'].capitalize()}"
+
+
+class _ComparisonColumn:
+    """Live output and timings of one model in a comparison run."""
+
+    def __init__(self, container: Any, model_name: str, start_time: float):
+        self.model_name = model_name
+        self.count_tokens = get_backend(get_model_config(model_name).get("tokenizer")).count
+        container.markdown(f"**{_model_label(model_name)}**")
+        self.stats = container.empty()
+        self._thinking_slot = container.empty()
+        self.renderer = StreamRenderer(container.empty(), self.count_tokens, start_time=start_time)
+        self._error_slot = container.empty()
+        self.thinking = None
+        self.parser = ThinkTagParser()
+        self.end_time = None
+        self.error = None
+
+    def write(self, chunk: Any) -> bool:
+        """Route a StreamChunk to the response or the reasoning expander. Returns True on flush."""
+        thinking, content = self.parser.feed(chunk.content) if chunk.content else ("", "")
+        reasoning = chunk.reasoning + thinking
+        flushed = self._write_thinking(reasoning) if reasoning else False
+        return self.renderer.write(content) or flushed
+
+    def _write_thinking(self, text: str) -> bool:
+        if self.thinking is None:
+            expander = self._thinking_slot.container().expander("🧠 Reasoning", expanded=False)
+            self.thinking = StreamRenderer(
+                expander.empty(), self.count_tokens, flush_interval=0.25, flush_chars=1000,
+                start_time=self.renderer.start_time
+            )
+        return self.thinking.write(text)
+
+    def finish(self, error: Optional[BaseException] = None):
+        thinking, content = self.parser.flush()
+        if thinking:
+            self._write_thinking(thinking)
+        self.renderer.write(content)
+        self.renderer.finish()
+        if self.thinking is not None:
+            self.thinking.finish()
+        self.end_time = time.perf_counter()
+        self.error = error
+        if error is not None:
+            self._error_slot.error(f"Error during response generation: {error}")
+        elif not self.renderer.text.strip():
+            self._error_slot.warning("No response was generated by the model.")
+        self.show_stats()
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        first = [r.first_token_time for r in (self.renderer, self.thinking) if r is not None and r.first_token_time]
+        return min(first) - self.renderer.start_time if first else None
+
+    def result(self) -> Dict[str, Any]:
+        """Timings and token counts so far; the rate is over the time since the first token."""
+        now = self.end_time or time.perf_counter()
+        ttft = self.time_to_first_token
+        completion_tokens = self.renderer.tokens
+        reasoning_tokens = self.thinking.tokens if self.thinking is not None else 0
+        generating = now - self.renderer.start_time - ttft if ttft is not None else 0
+        return {
+            "model_name": self.model_name,
+            "content": self.renderer.text.strip(),
+            "reasoning": self.thinking.text.strip() if self.thinking is not None else "",
+            "error": str(self.error) if self.error is not None else None,
+            "elapsed": now - self.renderer.start_time,
+            "ttft": ttft,
+            "completion_tokens": completion_tokens,
+            "reasoning_tokens": reasoning_tokens,
+            "tokens_per_second": (completion_tokens + reasoning_tokens) / generating if generating > 0 else None
+        }
+
+    def show_stats(self):
+        self.stats.caption(format_stats(self.result()))
+
+
+def format_stats(result: Dict[str, Any]) -> str:
+    """One-line summary of a model's timings and token counts."""
+    parts = [f"⏱️ {result['elapsed']:.1f}s"]
+    if result["ttft"] is not None:
+        parts.append(f"first token {result['ttft']:.2f}s")
+    if result["tokens_per_second"] is not None:
+        parts.append(f"{result['tokens_per_second']:.0f} tok/s")
+    tokens = f"{result['completion_tokens']} tokens"
+    if result["reasoning_tokens"]:
+        tokens += f" (+{result['reasoning_tokens']} reasoning)"
+    parts.append(tokens)
+    return " · ".join(parts)
+
+
+class ComparisonInterface:
+    """Sends one prompt to several models at once and streams their answers side by side.
+
+    Each prompt is sent on its own, without the chat history. Requests go through each model's
+    APIHandler, so they share the rate limits, connection pools, response cache and metrics
+    with the chat.
+    """
+
+    def __init__(self):
+        self._handlers = {}
+        if "comparison_runs" not in st.session_state:
+            st.session_state.comparison_runs = []
+
+    def _handler(self, model_name: str) -> APIHandler:
+        if model_name not in self._handlers:
+            self._handlers[model_name] = APIHandler(model_name)
+        return self._handlers[model_name]
+
+    def render_settings(self, model_config: Dict[str, Any]) -> bool:
+        """Render the comparison toggle and model picker in the sidebar; return True in comparison mode."""
+        st.subheader("Compare Models")
+        enabled = st.toggle(
+            "Side-by-side comparison",
+            key="comparison_mode",
+            help="Send each prompt to several models at once and compare their answers and speed."
+        )
+        if enabled:
+            models = available_models()
+            default = [model_config["model_name"]] if model_config.get("model_name") in models else []
+            st.multiselect(
+                "Models to compare",
+                models,
+                default=default,
+                max_selections=MAX_COMPARED_MODELS,
+                format_func=_model_label,
+                key="comparison_models",
+                help="Only models whose provider API key is configured are listed. Temperature and "
+                     "system prompt come from the model parameters above."
+            )
+        return enabled
+
+    def render(self, model_config: Dict[str, Any]):
+        """Render earlier comparisons and the prompt input."""
+        for run in st.session_state.comparison_runs:
+            self._render_run(run)
+
+        models = st.session_state.get("comparison_models", [])
+        prompt = st.chat_input(
+            "Send a prompt to every selected model" if models else "Select models to compare in the sidebar",
+            key="comparison_input",
+            disabled=not models
+        )
+        if prompt:
+            self._compare(prompt, models, model_config)
+
+    def _render_run(self, run: Dict[str, Any]):
+        with st.chat_message("user"):
+            st.markdown(run["prompt"])
+        st.caption(self._wall_time_summary(run))
+        for column, result in zip(st.columns(len(run["results"])), run["results"]):
+            with column:
+                st.markdown(f"**{_model_label(result['model_name'])}**")
+                st.caption(format_stats(result))
+                if result["reasoning"]:
+                    with st.expander("🧠 Reasoning", expanded=False):
+                        st.markdown(result["reasoning"])
+                st.markdown(result["content"])
+                if result["error"]:
+                    st.error(f"Error during response generation: {result['error']}")
+
+    @staticmethod
+    def _wall_time_summary(run: Dict[str, Any]) -> str:
+        total = sum(result["elapsed"] for result in run["results"])
+        return f"⏱️ Wall time {run['wall_time']:.1f}s · {total:.1f}s summed over {len(run['results'])} models"
+
+    def _max_tokens(self, model_name: str, model_config: Dict[str, Any]) -> Optional[int]:
+        """The chosen max tokens, capped for other models at their own default and context length."""
+        max_tokens = model_config.get("max_tokens")
+        if max_tokens is None or model_name == model_config.get("model_name"):
+            return max_tokens
+        config = get_model_config(model_name)
+        return min(max_tokens, config.get("default_max_tokens", max_tokens), config["context_length"])
+
+    def _compare(self, prompt: str, models: List[str], model_config: Dict[str, Any]):
+        """Stream one prompt from every model concurrently into its own column."""
+        with st.chat_message("user"):
+            st.markdown(prompt)
+        wall_time_container = st.empty()
+        messages = [{"role": "user", "content": prompt}]
+        session_id = st.session_state.get("session_id", "default")
+        start_time = time.perf_counter()
+        columns = [
+            _ComparisonColumn(container, model_name, start_time)
+            for container, model_name in zip(st.columns(len(models)), models)
+        ]
+
+        make_streams = [
+            lambda handler=self._handler(model_name), max_tokens=self._max_tokens(model_name, model_config):
+                handler.generate_response(
+                    messages=messages,
+                    temperature=model_config.get("temperature"),
+                    max_tokens=max_tokens,
+                    system_prompt=model_config.get("system_prompt"),
+                    allow_cache=model_config.get("allow_cache", False),
+                    session_id=session_id
+                )
+            for model_name in models
+        ]
+        for event in fan_out(make_streams):
+            column = columns[event.index]
+            if event.done:
+                column.finish(event.error)
+            elif column.write(event.item):
+                column.show_stats()
+
+        run = {
+            "prompt": prompt,
+            "wall_time": time.perf_counter() - start_time,
+            "results": [column.result() for column in columns]
+        }
+        wall_time_container.caption(self._wall_time_summary(run))
+        runs = st.session_state.comparison_runs
+        runs.append(run)
+        del runs[:-COMPARISON_HISTORY]
@@ -1,26 +1,106 @@
+import os
 import streamlit as st
+import uuid
 from typing import List, Dict, Any
+from ..config.models_config import get_prompt_caching
 from ..utils.tokenizer import Tokenizer
+from ..utils.conversation_store import CONVERSATION_STORE_SETTINGS, get_conversation_store
+from ..utils.summarizer import SUMMARY_SETTINGS, get_summarizer, summary_model
+
+# Share of the memory budget freed whenever turns are evicted. Evicting a block at a time rather
+# than a turn per message keeps the start of the prompt identical for several turns, so providers
+# can serve it from their prompt-prefix cache. Models without prefix caching evict a turn at a time.
+EVICTION_HEADROOM = float(os.environ.get("MEMORY_EVICTION_HEADROOM", 0.2))
+
+# Heading of the summary message that stands in for compacted turns
+SUMMARY_HEADING = "Summary of the earlier conversation:"
+
+
+def _summary_message(content: str) -> Dict[str, str]:
+    return {"role": "system", "content": f"{SUMMARY_HEADING}\n{content}"}
+
 
 class MemoryManager:
     def __init__(self, model_name: str):
         self.tokenizer = Tokenizer(model_name)
+        # Block eviction only pays off when the provider caches the prompt prefix
+        self.eviction_headroom = EVICTION_HEADROOM if get_prompt_caching(model_name).get("mode") else 0.0
+        # The configured summary model needs its provider's key; otherwise the chat model summarizes
+        self.summary_model = summary_model(model_name)
+        self.store = get_conversation_store()
         self._initialize_session_state()
 
     def _initialize_session_state(self):
         """Initialize session state variables for chat memory."""
+        if "conversation_id" not in st.session_state:
+            # Kept in the URL so a reload reopens the same conversation
+            conversation_id = st.query_params.get("conversation") or uuid.uuid4().hex
+            st.query_params["conversation"] = conversation_id
+            st.session_state.conversation_id = conversation_id
         if "messages" not in st.session_state:
-            st.session_state.messages = []
+            self._load_recent_messages()
+        if st.session_state.get("memory_tokenizer") != self.tokenizer.backend.name:
+            # Cached counts belong to the previous model's vocabulary
+            self._recount_messages()
+        if "pin_first_message" not in st.session_state:
+            st.session_state.pin_first_message = False
+        if "memory_compaction" not in st.session_state:
+            st.session_state.memory_compaction = SUMMARY_SETTINGS["mode"]
+            self._reset_summary()
         if "max_memory_tokens" not in st.session_state:
             st.session_state.max_memory_tokens = self.tokenizer.get_available_tokens()
+            self._manage_memory()
+
+    def _reset_summary(self):
+        """Forget the running summary; an in-flight request is ignored when it finishes."""
+        # {"content", "tokens"} once the first compaction has finished
+        st.session_state.memory_summary = None
+        # Evicted turns waiting for the summarizer, and the turns of the request in flight
+        st.session_state.summary_pending = []
+        st.session_state.summary_inflight = []
+        st.session_state.summary_future = None
+        # Why summarizing last failed, shown under the memory settings
+        st.session_state.summary_error = None
+        st.session_state.summary_usage = {"requests": 0, "cached": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def _load_recent_messages(self):
+        """Load the newest messages of the conversation from the store; older ones are paged in on request."""
+        limit = CONVERSATION_STORE_SETTINGS["recent_messages"]
+        messages = self.store.load_recent(st.session_state.conversation_id, limit, self.tokenizer.backend.name)
+        for message in messages:
+            # Stored counts are reused when they came from the same tokenizer
+            message["tokens"] = self.tokenizer.count_message_tokens(message)
+        st.session_state.messages = messages
+        st.session_state.memory_tokens = self.tokenizer.count_conversation_tokens(messages)
+        st.session_state.memory_tokenizer = self.tokenizer.backend.name
+        # Display-only messages older than the context window, loaded with load_earlier_messages
+        st.session_state.earlier_messages = []
+        st.session_state.history_exhausted = len(messages) < limit
+
+    def _recount_messages(self):
+        """Re-encode every message with the current tokenizer and rebuild the running total."""
+        for message in st.session_state.messages:
+            message.pop("tokens", None)
+            message["tokens"] = self.tokenizer.count_message_tokens(message)
+        # Running total of the cached per-message token counts
+        st.session_state.memory_tokens = self.tokenizer.count_conversation_tokens(st.session_state.messages)
+        st.session_state.memory_tokenizer = self.tokenizer.backend.name
+        summary = st.session_state.get("memory_summary")
+        if summary:
+            summary["tokens"] = self.tokenizer.count_message_tokens(_summary_message(summary["content"]))
 
     def render_memory_settings(self):
         """Render memory management settings in the sidebar."""
-        st.sidebar.subheader("Memory Management")
+        # A fragment, so changing these settings doesn't rerun (and re-render) the chat transcript
+        st.fragment(self._render_memory_settings)()
+
+    def _render_memory_settings(self):
+        """Render the memory limit, pinning and usage widgets."""
+        st.subheader("Memory Management")
         
         # Memory limit slider
         max_tokens = self.tokenizer.get_available_tokens()
-        st.session_state.max_memory_tokens = st.sidebar.slider(
+        st.session_state.max_memory_tokens = st.slider(
             "Max Memory Tokens",
             min_value=100,
             max_value=max_tokens,
@@ -29,43 +109,232 @@ class MemoryManager:
             help="Maximum number of tokens to keep in chat history. Older messages will be removed when exceeded."
         )
 
+        st.session_state.pin_first_message = st.checkbox(
+            "Keep first message",
+            value=st.session_state.pin_first_message,
+            help="Never remove the first user message when older messages are truncated."
+        )
+
+        st.session_state.memory_compaction = st.radio(
+            "When memory is full",
+            ["truncate", "summarize"],
+            index=["truncate", "summarize"].index(st.session_state.memory_compaction),
+            format_func=lambda x: {"truncate": "Drop oldest turns", "summarize": "Summarize oldest turns"}[x],
+            help=f"Summarizing folds evicted turns into a running summary written in the background by "
+                 f"{self.summary_model}, so long-range context survives at a bounded prompt size."
+        )
+        if st.session_state.get("summary_error"):
+            # This fragment renders inside the sidebar
+            st.warning(
+                f"Summarizing failed, so the oldest turns are dropped instead: {st.session_state.summary_error}",
+                icon="⚠️"
+            )
+
         # Display current token usage
-        current_tokens = self.tokenizer.count_conversation_tokens(st.session_state.messages)
-        st.sidebar.metric(
+        self._collect_summary()
+        current_tokens = st.session_state.memory_tokens + self._summary_tokens()
+        st.metric(
             "Current Token Usage",
             f"{current_tokens}/{st.session_state.max_memory_tokens}"
         )
+        summary = st.session_state.memory_summary
+        usage = st.session_state.summary_usage
+        if summary or usage["requests"]:
+            pending = len(st.session_state.summary_pending) + len(st.session_state.summary_inflight)
+            st.caption(
+                f"Summary: {self._summary_tokens()} tokens"
+                f"{f', {pending} turns pending' if pending else ''} · "
+                f"cost {usage['prompt_tokens']:,} in / {usage['completion_tokens']:,} out tokens "
+                f"over {usage['requests']} requests ({usage['cached']} cached)"
+            )
+            if summary:
+                with st.expander("Conversation summary"):
+                    st.markdown(summary["content"])
 
         # Clear chat button
-        if st.sidebar.button("Clear Chat History"):
+        if st.button("Clear Chat History"):
             self.clear_messages()
+            st.rerun()
 
     def add_message(self, role: str, content: str):
         """Add a message to the chat history and manage memory."""
-        st.session_state.messages.append({"role": role, "content": content})
+        message = {"role": role, "content": content}
+        # Cache the token count alongside the message so it is only encoded once
+        message["tokens"] = self.tokenizer.count_message_tokens(message)
+        message["id"] = self.store.append(st.session_state.conversation_id, message, self.tokenizer.backend.name)
+        st.session_state.messages.append(message)
+        st.session_state.memory_tokens += message["tokens"]
+        self._collect_summary()
         self._manage_memory()
 
     def _manage_memory(self):
-        """Manage chat memory by truncating if necessary."""
-        current_tokens = self.tokenizer.count_conversation_tokens(st.session_state.messages)
-        if current_tokens > st.session_state.max_memory_tokens:
-            st.session_state.messages = self.tokenizer.truncate_conversation(
-                st.session_state.messages,
-                st.session_state.max_memory_tokens
+        """Manage chat memory by truncating (or summarizing) the oldest turns if necessary."""
+        # The summary shares the budget, so the prompt stays bounded as it grows
+        budget = max(st.session_state.max_memory_tokens - self._summary_tokens(), 0)
+        if st.session_state.memory_tokens > budget:
+            self._evict_to(int(budget * (1 - self.eviction_headroom)))
+        self._start_summary()
+
+    def _evict_to(self, target_tokens: int) -> int:
+        """Evict (or queue for summarizing) the oldest unpinned turns until memory fits target_tokens.
+
+        The newest message is always kept. Returns the number of tokens evicted.
+        """
+        messages = st.session_state.messages
+        pinned = self.tokenizer.pinned_prefix_length(messages, st.session_state.pin_first_message)
+        start, end = self.tokenizer.eviction_range(
+            messages,
+            target_tokens,
+            total_tokens=st.session_state.memory_tokens,
+            pinned=pinned
+        )
+        if start == end:
+            return 0
+        # Only the evicted messages are visited; the cached counts keep the total exact
+        evicted = self.tokenizer.count_conversation_tokens(messages[start:end])
+        st.session_state.memory_tokens -= evicted
+        if st.session_state.memory_compaction == "summarize":
+            st.session_state.summary_pending.extend(messages[start:end])
+        del messages[start:end]
+        # Evicted messages stay in the store and can be paged back in for display
+        st.session_state.history_exhausted = False
+        return evicted
+
+    def make_room(self, tokens: int) -> int:
+        """Evict the oldest turns to shrink the prompt by at least ``tokens`` before a request is sent.
+
+        Used by the preflight context check when the memory budget leaves too little of the
+        context window for a response. As with budget eviction, a further
+        ``eviction_headroom`` share is freed. Returns the number of tokens evicted.
+        """
+        target = int((st.session_state.memory_tokens - tokens) * (1 - self.eviction_headroom))
+        evicted = self._evict_to(max(target, 0))
+        self._start_summary()
+        return evicted
+
+    def _summary_tokens(self) -> int:
+        summary = st.session_state.memory_summary
+        return summary["tokens"] if summary else 0
+
+    def _start_summary(self):
+        """Send the pending evicted turns to the summarizer unless a request is already in flight."""
+        if st.session_state.summary_future is not None or not st.session_state.summary_pending:
+            return
+        summary = st.session_state.memory_summary
+        inflight = st.session_state.summary_pending
+        st.session_state.summary_pending = []
+        st.session_state.summary_inflight = inflight
+        try:
+            st.session_state.summary_future = get_summarizer(self.summary_model).submit(
+                summary["content"] if summary else None,
+                inflight,
+                # Leave most of the budget to the conversation itself
+                max_tokens=max(min(SUMMARY_SETTINGS["max_tokens"], st.session_state.max_memory_tokens // 4), 1),
+                session_id=st.session_state.conversation_id
             )
+        except Exception as e:
+            self._summary_failed(e)
+
+    def _collect_summary(self):
+        """Adopt a finished summary, then queue up any turns evicted while it was running."""
+        future = st.session_state.summary_future
+        if future is None or not future.done():
+            return
+        st.session_state.summary_future = None
+        try:
+            result = future.result()
+        except Exception as e:
+            self._summary_failed(e)
+        else:
+            st.session_state.summary_error = None
+            st.session_state.memory_summary = {
+                "content": result.content,
+                "tokens": self.tokenizer.count_message_tokens(_summary_message(result.content))
+            }
+            usage = st.session_state.summary_usage
+            usage["requests"] += 1
+            usage["cached"] += result.cached
+            usage["prompt_tokens"] += result.prompt_tokens
+            usage["completion_tokens"] += result.completion_tokens
+        st.session_state.summary_inflight = []
+        # A longer summary leaves less room for turns
+        self._manage_memory()
+
+    def _summary_failed(self, error: Exception):
+        """Fall back to plain truncation and keep the error for the sidebar warning.
+
+        Retrying would fail the same way on every rerun, so the evicted turns are dropped as
+        with truncation; they stay in the conversation store and can still be paged in.
+        """
+        st.session_state.summary_error = str(error)
+        st.session_state.memory_compaction = "truncate"
+        st.session_state.summary_pending = []
+        st.session_state.summary_inflight = []
 
     def clear_messages(self):
         """Clear all messages from chat history."""
+        self.store.clear(st.session_state.conversation_id)
         st.session_state.messages = []
+        st.session_state.memory_tokens = 0
+        st.session_state.earlier_messages = []
+        st.session_state.history_exhausted = True
+        self._reset_summary()
 
     def get_messages(self) -> List[Dict[str, str]]:
-        """Get all messages in chat history."""
-        return st.session_state.messages
+        """Get the messages in the context window (what is sent to the model).
+
+        With summarizing compaction the running summary comes first, after any pinned messages.
+        """
+        self._collect_summary()
+        messages = st.session_state.messages
+        summary = st.session_state.memory_summary
+        if not summary:
+            return messages
+        pinned = self.tokenizer.pinned_prefix_length(messages, st.session_state.pin_first_message)
+        summary_message = summary.get("message")
+        # Reuse the same dict across calls so the formatted prompt prefix can be reused too
+        if summary_message is None or summary_message["tokens"] != summary["tokens"]:
+            summary_message = summary["message"] = {**_summary_message(summary["content"]), "tokens": summary["tokens"]}
+        return messages[:pinned] + [summary_message] + messages[pinned:]
+
+    def get_history(self) -> List[Dict[str, Any]]:
+        """Get the messages to display: any pinned prefix, paged-in earlier messages, then the context window."""
+        messages = st.session_state.messages
+        earlier = st.session_state.earlier_messages
+        if not earlier:
+            return messages
+        pinned = self.tokenizer.pinned_prefix_length(messages, st.session_state.pin_first_message)
+        return messages[:pinned] + earlier + messages[pinned:]
+
+    def has_earlier_messages(self) -> bool:
+        """Whether the store may hold messages older than the ones displayed."""
+        return not st.session_state.history_exhausted
+
+    def load_earlier_messages(self, page_size: int = None):
+        """Page the next batch of older messages in from the store for display."""
+        page_size = page_size or CONVERSATION_STORE_SETTINGS["page_size"]
+        messages = st.session_state.messages
+        earlier = st.session_state.earlier_messages
+        pinned = messages[:self.tokenizer.pinned_prefix_length(messages, st.session_state.pin_first_message)]
+        if earlier:
+            before_id = earlier[0]["id"]
+        elif len(messages) > len(pinned):
+            before_id = messages[len(pinned)]["id"]
+        else:
+            st.session_state.history_exhausted = True
+            return
+        page = self.store.load_before(
+            st.session_state.conversation_id, before_id, page_size, self.tokenizer.backend.name
+        )
+        pinned_ids = {message["id"] for message in pinned}
+        earlier[:0] = [message for message in page if message["id"] not in pinned_ids]
+        if len(page) < page_size:
+            st.session_state.history_exhausted = True
 
     def get_token_usage(self) -> Dict[str, int]:
         """Get current token usage statistics."""
-        current_tokens = self.tokenizer.count_conversation_tokens(st.session_state.messages)
         return {
-            "current": current_tokens,
+            "current": st.session_state.memory_tokens,
+            "summary": self._summary_tokens(),
             "max": st.session_state.max_memory_tokens
-        } 
\ No newline at end of file
+        } 
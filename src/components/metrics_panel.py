@@ -0,0 +1,101 @@
+import streamlit as st
+from ..utils.metrics import get_metrics, METRICS_SETTINGS
+from ..utils.http_pool import get_pool_stats
+from ..utils.rate_limiter import get_scheduler_stats
+from ..utils.response_cache import get_response_cache
+from ..utils.rerun_profiler import get_profiler
+
+
+def _ms(value):
+    return f"{value * 1000:.0f}" if value is not None else "–"
+
+
+def render_metrics_panel():
+    """Render provider latency/throughput aggregates and exports behind a sidebar toggle."""
+    # A toggle rather than an expander: collapsed expanders still build their content every rerun
+    if not st.sidebar.toggle("📈 Provider Metrics", key="show_provider_metrics"):
+        return
+    with st.sidebar.container(border=True):
+        metrics = get_metrics()
+        aggregates = metrics.aggregates()
+        if not aggregates:
+            st.caption("No requests recorded yet.")
+        else:
+            rows = []
+            for stats in aggregates.values():
+                rows.append({
+                    "Model": stats["model"],
+                    "Requests": stats["requests"],
+                    "Cached": stats["cache_hits"],
+                    "Errors": ", ".join(f"{name} ×{count}" for name, count in stats["errors"].items()) or "–",
+                    "Queue p95 (ms)": _ms(stats["queue_wait_p95"]),
+                    "Connect p50 (ms)": _ms(stats["connect_time_p50"]),
+                    "TTFT p50/p95/p99 (ms)": "/".join(_ms(stats[f"ttft_p{q}"]) for q in (50, 95, 99)),
+                    "Max gap p95 (ms)": _ms(stats["max_gap_p95"]),
+                    "Total p50/p95/p99 (ms)": "/".join(_ms(stats[f"total_latency_p{q}"]) for q in (50, 95, 99)),
+                    "Tokens/s p50": f"{stats['tokens_per_sec_p50']:.0f}" if stats["tokens_per_sec_p50"] else "–",
+                    "Prompt cached": (f"{stats['prefix_cache_ratio']:.0%} of {stats['prompt_tokens']:,}"
+                                      if stats["prefix_cache_ratio"] is not None else "–"),
+                    "Usage reported": f"{stats['usage_reported']}/{stats['requests'] - stats['cache_hits']}",
+                    "TTFT p50 hit/miss (ms)": "/".join(
+                        _ms(stats[f"ttft_prefix_{label}_p50"]) for label in ("hit", "miss")
+                    )
+                })
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+            st.caption(
+                "Streamed responses, such as chat turns, report no token usage, so the prompt cache "
+                "columns only cover non-streamed requests such as memory summaries."
+            )
+
+        st.caption("Connection pools")
+        st.json(get_pool_stats(), expanded=False)
+        st.caption("Request queues")
+        st.json(get_scheduler_stats(), expanded=False)
+        st.caption("Response cache")
+        st.json(get_response_cache().stats(), expanded=False)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                "JSONL",
+                metrics.to_jsonl(),
+                file_name="llm_metrics.jsonl",
+                mime="application/jsonl",
+                use_container_width=True
+            )
+        with col2:
+            st.download_button(
+                "Prometheus",
+                metrics.to_prometheus(),
+                file_name="llm_metrics.prom",
+                mime="text/plain",
+                use_container_width=True
+            )
+        if METRICS_SETTINGS["port"]:
+            st.caption(f"Serving /metrics on 127.0.0.1:{METRICS_SETTINGS['port']}")
+
+
+def render_rerun_profile():
+    """Render this session's script-run cost per section behind a sidebar toggle."""
+    if not st.sidebar.toggle("⏱️ Rerun Profile", key="show_rerun_profile"):
+        return
+    with st.sidebar.container(border=True):
+        stats = get_profiler().stats()
+        if not stats:
+            st.caption("No reruns recorded yet.")
+            return
+        st.dataframe(
+            [
+                {
+                    "Section": name,
+                    "Last (ms)": f"{section['last_ms']:.1f}",
+                    "Mean (ms)": f"{section['mean_ms']:.1f}",
+                    "Max (ms)": f"{section['max_ms']:.1f}",
+                    "Runs": section["runs"]
+                }
+                for name, section in stats.items()
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+        st.caption("\"script\" is the previous full run; sections also count fragment-only reruns.")
@@ -1,6 +1,6 @@
 import streamlit as st
 from typing import Dict, Any
-from ..config.models_config import SUPPORTED_MODELS
+from ..config.models_config import SUPPORTED_MODELS, ROUTING_SETTINGS, get_equivalent_models
 
 class ModelSelector:
     def __init__(self, provider: str):
@@ -80,9 +80,21 @@ class ModelSelector:
         - Provider: {model_config['provider'].capitalize()}
         """)
 
-        # Model parameters
-        st.sidebar.subheader("Model Parameters")
-        temperature = st.sidebar.slider(
+        # Parameters live in a fragment so moving a slider doesn't rerun (and re-render) the whole app
+        st.fragment(self._render_parameters)(selected_model_id, model_config)
+
+        # Add a note about preview models
+        if model_config["provider"] == "groq":
+            st.sidebar.warning(
+                "Note: These are preview models intended for evaluation purposes only. "
+                "They may be discontinued at short notice."
+            )
+        return st.session_state["model_config"]
+
+    def _render_parameters(self, selected_model_id: str, model_config: Dict[str, Any]):
+        """Render the generation parameters and store the resulting configuration in session state."""
+        st.subheader("Model Parameters")
+        temperature = st.slider(
             "Temperature",
             min_value=0.0,
             max_value=2.0,
@@ -90,7 +102,7 @@ class ModelSelector:
             step=0.1,
             help="Higher values make the output more random, lower values make it more deterministic."
         )
-        max_tokens = st.sidebar.slider(
+        max_tokens = st.slider(
             "Max Tokens",
             min_value=1,
             max_value=model_config["context_length"],
@@ -98,25 +110,51 @@ class ModelSelector:
             step=1,
             help="Maximum number of tokens to generate in the response."
         )
+        allow_cache = st.checkbox(
+            "Reuse cached responses",
+            value=False,
+            help="Answer repeated prompts from the response cache. Always on at temperature 0."
+        )
+        # Routing across providers serving the same model family
+        routing = "single"
+        hedge_after = ROUTING_SETTINGS["hedge_after"]
+        if get_equivalent_models(selected_model_id):
+            routing = st.radio(
+                "Provider Routing",
+                ["single", "failover", "hedged"],
+                format_func=lambda x: {
+                    "single": "Single provider",
+                    "failover": "Failover",
+                    "hedged": "Hedged"
+                }[x],
+                help="Failover retries on another provider serving the same model on error or timeout. "
+                     "Hedged also races a second provider when the first token is slow."
+            )
+            if routing == "hedged":
+                hedge_after = st.slider(
+                    "Hedge After (s)",
+                    min_value=0.5,
+                    max_value=10.0,
+                    value=ROUTING_SETTINGS["hedge_after"],
+                    step=0.5,
+                    help="Send a hedged request if no token has arrived after this long (about the provider's p95)."
+                )
         # System prompt
-        st.sidebar.subheader("System Prompt")
-        system_prompt = st.sidebar.text_area(
+        st.subheader("System Prompt")
+        system_prompt = st.text_area(
             "Custom System Prompt",
             value="",
             height=100,
             help="Optional system prompt to guide the model's behavior. Leave empty to use default."
         )
-        # Add a note about preview models
-        if model_config["provider"] == "groq":
-            st.sidebar.warning(
-                "Note: These are preview models intended for evaluation purposes only. "
-                "They may be discontinued at short notice."
-            )
-        return {
+        st.session_state["model_config"] = {
             "model_name": selected_model_id,
             "provider": model_config["provider"],
             "temperature": temperature,
             "max_tokens": max_tokens,
             "system_prompt": system_prompt if system_prompt else None,
+            "allow_cache": allow_cache,
+            "routing": routing,
+            "hedge_after": hedge_after,
             "context_length": model_config["context_length"]
         } 
\ No newline at end of file
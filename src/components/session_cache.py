@@ -0,0 +1,40 @@
+import hashlib
+import os
+import streamlit as st
+from ..config.models_config import get_model_config
+from .chat import ChatInterface
+from .comparison import ComparisonInterface
+from .model_selector import ModelSelector
+
+
+def _api_key_fingerprint(model_name: str) -> str:
+    """Hash of the provider API key the model would use, so a changed key rebuilds its handler."""
+    provider = get_model_config(model_name)["provider"]
+    key = os.environ.get(f"{provider.upper()}_API_KEY", "")
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+def get_chat_interface(model_name: str) -> ChatInterface:
+    """Get this session's ChatInterface, rebuilding it only when the model or its API key changes."""
+    cache_key = (model_name, _api_key_fingerprint(model_name))
+    cached = st.session_state.get("chat_interface")
+    if cached is None or st.session_state.get("chat_interface_key") != cache_key:
+        cached = ChatInterface(model_name)
+        st.session_state.chat_interface = cached
+        st.session_state.chat_interface_key = cache_key
+    return cached
+
+
+def get_model_selector(provider: str) -> ModelSelector:
+    """Get this session's ModelSelector for a provider; its model lists are scanned once."""
+    selectors = st.session_state.setdefault("model_selectors", {})
+    if provider not in selectors:
+        selectors[provider] = ModelSelector(provider)
+    return selectors[provider]
+
+
+def get_comparison_interface() -> ComparisonInterface:
+    """Get this session's ComparisonInterface, which keeps one APIHandler per compared model."""
+    if "comparison_interface" not in st.session_state:
+        st.session_state.comparison_interface = ComparisonInterface()
+    return st.session_state.comparison_interface
@@ -0,0 +1,126 @@
+import time
+from typing import Any, Callable
+
+CODE_FENCES = ("```", "~~~")
+
+
+def _freeze_point(text: str) -> int:
+    """Offset just past the last blank line of ``text`` outside a code fence, or 0 if there is none."""
+    point = offset = 0
+    in_fence = False
+    for line in text.splitlines(keepends=True):
+        offset += len(line)
+        stripped = line.strip()
+        if stripped.startswith(CODE_FENCES):
+            in_fence = not in_fence
+        elif not stripped and not in_fence and line.endswith("\n"):
+            point = offset
+    return point
+
+
+class StreamRenderer:
+    """Coalesce streamed text and flush it to a Streamlit placeholder on a time or size budget.
+
+    Chunks are buffered and only re-rendered every ``flush_interval`` seconds or ``flush_chars``
+    characters, so the number of markdown deltas sent per response stays bounded no matter how
+    small the provider's chunks are. Finished paragraphs are frozen into their own elements and
+    each flush re-renders only the unfinished tail, so a flush costs the same late in a long
+    response as early on. Token counts are kept as running totals over each flushed delta
+    instead of re-scanning the whole buffer.
+    """
+
+    def __init__(
+        self,
+        container: Any,
+        count_tokens: Callable[[str], int],
+        flush_interval: float = 0.05,
+        flush_chars: int = 200,
+        unsafe_allow_html: bool = True,
+        start_time: float = None
+    ):
+        self.container = container
+        self.count_tokens = count_tokens
+        self.flush_interval = flush_interval
+        self.flush_chars = flush_chars
+        self.unsafe_allow_html = unsafe_allow_html
+
+        self.start_time = start_time if start_time is not None else time.perf_counter()
+        self.first_token_time = None
+        self.final_render_time = None
+        self.last_flush_time = self.start_time
+
+        self.text = ""
+        self.tokens = 0
+        self.flushes = 0
+        self._pending = []
+        self._pending_chars = 0
+        # Characters of text already rendered into frozen segments, and the segment of the rest
+        self._frozen = 0
+        self._segments = None
+        self._tail = None
+
+    @property
+    def time_to_first_token(self) -> float:
+        """Seconds from the start of the stream to the first non-empty chunk, or None."""
+        if self.first_token_time is None:
+            return None
+        return self.first_token_time - self.start_time
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the stream started."""
+        return time.perf_counter() - self.start_time
+
+    def write(self, text: str) -> bool:
+        """Buffer a chunk and flush if the time or size budget is exhausted. Returns True on flush."""
+        if not text:
+            return False
+        now = time.perf_counter()
+        if self.first_token_time is None:
+            self.first_token_time = now
+        self._pending.append(text)
+        self._pending_chars += len(text)
+        if self._pending_chars >= self.flush_chars or now - self.last_flush_time >= self.flush_interval:
+            self.flush(now)
+            return True
+        return False
+
+    def flush(self, now: float = None) -> None:
+        """Render everything buffered so far, freezing paragraphs finished since the last flush."""
+        if self._pending:
+            delta = "".join(self._pending)
+            self._pending = []
+            self._pending_chars = 0
+            self.text += delta
+            self.tokens += self.count_tokens(delta)
+        if self._segments is None:
+            self._segments = self.container.container()
+            self._tail = self._segments.empty()
+        tail = self.text[self._frozen:]
+        point = _freeze_point(tail)
+        if point:
+            # Render the finished paragraphs one last time and start a new segment for the rest
+            self._tail.markdown(tail[:point], unsafe_allow_html=self.unsafe_allow_html)
+            self._frozen += point
+            self._tail = self._segments.empty()
+            tail = tail[point:]
+        if tail:
+            self._tail.markdown(tail, unsafe_allow_html=self.unsafe_allow_html)
+        self.flushes += 1
+        self.last_flush_time = now if now is not None else time.perf_counter()
+
+    def finish(self) -> str:
+        """Flush any remaining text, render the final response and return it stripped."""
+        if self._pending:
+            delta = "".join(self._pending)
+            self._pending = []
+            self._pending_chars = 0
+            self.text += delta
+            self.tokens += self.count_tokens(delta)
+        final_text = self.text.strip()
+        render_start = time.perf_counter()
+        if final_text:
+            # One element replaces the segments, so markdown spanning paragraphs (e.g. lists) renders as a whole
+            self.container.markdown(final_text)
+        self.final_render_time = time.perf_counter() - render_start
+        return final_text
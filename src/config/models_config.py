@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 # Supported models configuration
 SUPPORTED_MODELS = {
@@ -7,6 +7,7 @@ SUPPORTED_MODELS = {
             "groq/gemma2-9b-it": {
                 "name": "Gemma 2 9B IT",
                 "provider": "groq",
+                "tokenizer": "gemma",
                 "context_length": 8192,
                 "is_instruction": True,
                 "default_temperature": 0.7,
@@ -18,7 +19,11 @@ SUPPORTED_MODELS = {
             "groq/llama-3.3-70b-versatile": {
                 "name": "LLaMA 3.3 70B Versatile",
                 "provider": "groq",
+                "tokenizer": "llama3",
                 "context_length": 128000,
+                "rate_limits": {
+                    "tpm": 12000
+                },
                 "is_instruction": True,
                 "default_temperature": 0.7,
                 "default_max_tokens": 32768,
@@ -27,6 +32,7 @@ SUPPORTED_MODELS = {
             "groq/llama-3.1-8b-instant": {
                 "name": "LLaMA 3.1 8B Instant",
                 "provider": "groq",
+                "tokenizer": "llama3",
                 "context_length": 128000,
                 "is_instruction": True,
                 "default_temperature": 0.7,
@@ -36,6 +42,8 @@ SUPPORTED_MODELS = {
             "groq/llama3-70b-8192": {
                 "name": "LLaMA3 70B 8192",
                 "provider": "groq",
+                "tokenizer": "llama3",
+                "equivalence_group": "llama3-70b",
                 "context_length": 8192,
                 "is_instruction": True,
                 "default_temperature": 0.7,
@@ -45,6 +53,8 @@ SUPPORTED_MODELS = {
             "groq/llama3-8b-8192": {
                 "name": "LLaMA3 8B 8192",
                 "provider": "groq",
+                "tokenizer": "llama3",
+                "equivalence_group": "llama3-8b",
                 "context_length": 8192,
                 "is_instruction": True,
                 "default_temperature": 0.7,
@@ -63,6 +73,7 @@ SUPPORTED_MODELS = {
             "groq/mistral-saba-24b": {
                 "name": "Mistral Saba 24B (Preview)",
                 "provider": "groq",
+                "tokenizer": "mistral",
                 "context_length": 32000,
                 "is_instruction": True,
                 "is_preview": True
@@ -72,6 +83,7 @@ SUPPORTED_MODELS = {
             "groq/meta-llama/llama-4-maverick-17b-128e-instruct": {
                 "name": "LLaMA 4 Maverick 17B 128E Instruct (Preview)",
                 "provider": "groq",
+                "tokenizer": "llama4",
                 "context_length": 131072,
                 "default_max_tokens": 8192,
                 "is_instruction": True,
@@ -80,14 +92,19 @@ SUPPORTED_MODELS = {
             "groq/meta-llama/llama-4-scout-17b-16e-instruct": {
                 "name": "LLaMA 4 Scout 17B 16E Instruct (Preview)",
                 "provider": "groq",
+                "tokenizer": "llama4",
                 "context_length": 131072,
                 "default_max_tokens": 8192,
+                "rate_limits": {
+                    "tpm": 30000
+                },
                 "is_instruction": True,
                 "is_preview": True
             },
             "groq/meta-llama/Llama-Guard-4-12B": {
                 "name": "LLaMA Guard 4 12B (Preview)",
                 "provider": "groq",
+                "tokenizer": "llama4",
                 "context_length": 131072,
                 "default_max_tokens": 128,
                 "is_instruction": True,
@@ -98,6 +115,8 @@ SUPPORTED_MODELS = {
             "groq/deepseek-r1-distill-llama-70b": {
                 "name": "DeepSeek R1 Distill LLaMA 70B (Preview)",
                 "provider": "groq",
+                "tokenizer": "llama3",
+                "equivalence_group": "deepseek-r1",
                 "context_length": 128000,
                 "is_instruction": True,
                 "is_preview": True
@@ -121,6 +140,7 @@ SUPPORTED_MODELS = {
             "groq/qwen-qwq-32b": {
                 "name": "Qwen QWQ 32B (Preview)",
                 "provider": "groq",
+                "tokenizer": "qwen",
                 "context_length": 128000,
                 "is_instruction": True,
                 "is_preview": True
@@ -132,6 +152,8 @@ SUPPORTED_MODELS = {
             "replicate/deepseek-ai/deepseek-r1": {
                 "name": "deepseek-r1",
                 "provider": "replicate",
+                "tokenizer": "deepseek",
+                "equivalence_group": "deepseek-r1",
                 "context_length": 18192,
                 "is_instruction": True,
                 "default_temperature": 0.1,
@@ -140,6 +162,8 @@ SUPPORTED_MODELS = {
             "replicate/meta/meta-llama-3-8b-instruct": {
                 "name": "LLaMA 3 8B Instruct",
                 "provider": "replicate",
+                "tokenizer": "llama3",
+                "equivalence_group": "llama3-8b",
                 "context_length": 8192,
                 "is_instruction": True,
                 "default_temperature": 0.7,
@@ -148,6 +172,8 @@ SUPPORTED_MODELS = {
             "replicate/meta/meta-llama-3-70b-instruct": {
                 "name": "LLaMA 3 70B Instruct",
                 "provider": "replicate",
+                "tokenizer": "llama3",
+                "equivalence_group": "llama3-70b",
                 "context_length": 8192,
                 "is_instruction": True,
                 "default_temperature": 0.7,
@@ -156,6 +182,7 @@ SUPPORTED_MODELS = {
             "replicate/meta/meta-llama-3-13b-instruct": {
                 "name": "LLaMA 3 13B Instruct",
                 "provider": "replicate",
+                "tokenizer": "llama3",
                 "context_length": 8192,
                 "is_instruction": True,
                 "default_temperature": 0.7,
@@ -168,6 +195,7 @@ SUPPORTED_MODELS = {
             "gemini/gemini-2.5-flash-preview-05-20": {
                 "name": "Gemini Flash 2.5",
                 "provider": "gemini",
+                "tokenizer": "gemini",
                 "context_length":128000,
                 "is_instruction": True,
                 "default_temperature": 0.5,
@@ -177,6 +205,7 @@ SUPPORTED_MODELS = {
             "gemini/gemini-pro": {
                 "name": "Gemini Pro （Need premium API_key）",
                 "provider": "gemini",
+                "tokenizer": "gemini",
                 "context_length": 128000,
                 "is_instruction": True,
                 "default_temperature": 0.7,
@@ -202,6 +231,8 @@ SUPPORTED_MODELS = {
             "openrouter/deepseek/deepseek-r1-0528:free": {
                 "name": "deepseek-r1-0528",
                 "provider": "openrouter",
+                "tokenizer": "deepseek",
+                "equivalence_group": "deepseek-r1",
                 "context_length": 164000,
                 "is_instruction": True,
                 "default_temperature": 0.5,
@@ -212,6 +243,7 @@ SUPPORTED_MODELS = {
             "openrouter/deepseek/deepseek-r1-0528-qwen3-8b:free": {
                 "name": "deepseek-r1-0528-qwen3-8b",
                 "provider": "openrouter",
+                "tokenizer": "qwen",
                 "context_length": 131000,
                 "is_instruction": True,
                 "default_temperature": 0.5,
@@ -223,6 +255,121 @@ SUPPORTED_MODELS = {
     }
 }
 
+# Multi-provider routing: "hedge_after" is the first-token delay (seconds, roughly the provider's
+# p95 time to first token) after which a hedged request goes to the next equivalent model, and
+# "first_token_timeout" is how long failover waits before abandoning a provider.
+ROUTING_SETTINGS = {
+    "hedge_after": 2.0,
+    "first_token_timeout": 30.0
+}
+
+# Preflight context check before a request is sent. The response always gets at least
+# min_completion_tokens of the context window: max_tokens is lowered to what is left after the prompt,
+# and a prompt that leaves less is truncated (chat) or rejected without contacting the provider.
+# message_overhead covers each message's chat-template tokens; margin pads the prompt estimate
+# for tokenizers that only approximate the model's vocabulary.
+PREFLIGHT_SETTINGS = {
+    "min_completion_tokens": 256,
+    "message_overhead": 4,
+    "margin": 0.05
+}
+
+# Per-provider request (rpm) and token (tpm) per-minute limits enforced by the request scheduler.
+# Models can override them with a "rate_limits" field; None means unlimited.
+RATE_LIMITS = {
+    "groq": {
+        "rpm": 30,
+        "tpm": 6000
+    },
+    "replicate": {
+        "rpm": 600,
+        "tpm": None
+    },
+    "gemini": {
+        "rpm": 10,
+        "tpm": 250000
+    },
+    "openrouter": {
+        "rpm": 20,
+        "tpm": None
+    }
+}
+
+# Prompt-prefix caching per provider. "cache_control" marks cache breakpoints (the system prompt, the
+# previous user turn and the newest message) with Anthropic-style ephemeral cache_control content parts;
+# "implicit" providers cache a repeated prefix on their own, so it only has to stay byte-for-byte
+# stable; None means no prefix caching. Gemini 2.5 caches implicitly, while its explicit context
+# caching creates a billed cache object per distinct prefix, which a growing chat never reuses.
+# "stream_usage" asks for token usage (including cached tokens) at the end of streamed responses. It
+# is off because LiteLLM 1.63's OpenAI-like stream parser fails on the trailing usage chunk (it has no
+# choices); non-streamed responses always report usage. Models can override with "prompt_caching".
+PROMPT_CACHING = {
+    "groq": {
+        "mode": "implicit",
+        "stream_usage": False
+    },
+    "replicate": {
+        "mode": None,
+        "stream_usage": False
+    },
+    "gemini": {
+        "mode": "implicit",
+        "stream_usage": False
+    },
+    "openrouter": {
+        "mode": "cache_control",
+        "stream_usage": False
+    }
+}
+
+# Tokenizer backends referenced by the "tokenizer" field of each model.
+# "file" is a HuggingFace tokenizer.json under the local vocab directory, "encoding" a tiktoken
+# encoding (for file specs, the close approximation used when no vocabulary is installed), and
+# "chars_per_token" the estimate used when neither can be loaded.
+DEFAULT_TOKENIZER = "cl100k_base"
+
+TOKENIZER_SPECS = {
+    "cl100k_base": {
+        "encoding": "cl100k_base",
+        "chars_per_token": 4.0
+    },
+    "llama3": {
+        "file": "llama3/tokenizer.json",
+        "encoding": "cl100k_base",
+        "chars_per_token": 4.2
+    },
+    "llama4": {
+        "file": "llama4/tokenizer.json",
+        "encoding": "cl100k_base",
+        "chars_per_token": 4.3
+    },
+    "gemma": {
+        "file": "gemma/tokenizer.json",
+        "encoding": "cl100k_base",
+        "chars_per_token": 4.0
+    },
+    "gemini": {
+        "file": "gemini/tokenizer.json",
+        "encoding": "cl100k_base",
+        "chars_per_token": 4.0
+    },
+    "mistral": {
+        "file": "mistral/tokenizer.json",
+        "encoding": "cl100k_base",
+        "chars_per_token": 3.7
+    },
+    "qwen": {
+        "file": "qwen/tokenizer.json",
+        "encoding": "cl100k_base",
+        "chars_per_token": 4.0
+    },
+    "deepseek": {
+        "file": "deepseek/tokenizer.json",
+        "encoding": "cl100k_base",
+        "chars_per_token": 3.9
+    }
+}
+
 # Default system prompts for different model types
 SYSTEM_PROMPTS = {
     "instruction": """You are a helpful AI assistant. You aim to provide accurate, helpful, and safe responses.
@@ -292,4 +439,40 @@ PROMPT_TEMPLATES = {
             "post_message": "\n\n"
         }
     }
-} 
+}
+
+# Flat model_id -> config index, built once at import so lookups are O(1)
+MODEL_INDEX: Dict[str, Dict[str, Any]] = {
+    model_id: config
+    for companies in SUPPORTED_MODELS.values()
+    for models in companies.values()
+    for model_id, config in models.items()
+    if isinstance(config, dict)
+}
+
+
+def get_model_config(model_name: str) -> Dict[str, Any]:
+    """Get the configuration for a model from the flat index."""
+    try:
+        return MODEL_INDEX[model_name]
+    except KeyError:
+        raise ValueError(f"Model {model_name} not found in configuration") from None
+
+def get_prompt_caching(model_name: str) -> Dict[str, Any]:
+    """Get a model's prompt caching settings: its provider's, with the model's own overrides."""
+    config = get_model_config(model_name)
+    return {**PROMPT_CACHING.get(config["provider"], {}), **config.get("prompt_caching", {})}
+
+# Models serving the same model family on different providers, for failover and hedging
+EQUIVALENCE_GROUPS: Dict[str, List[str]] = {}
+for _model_id, _config in MODEL_INDEX.items():
+    if "equivalence_group" in _config:
+        EQUIVALENCE_GROUPS.setdefault(_config["equivalence_group"], []).append(_model_id)
+
+
+def get_equivalent_models(model_name: str) -> List[str]:
+    """Get the other models in the same equivalence group, in configuration order."""
+    group = get_model_config(model_name).get("equivalence_group")
+    if group is None:
+        return []
+    return [model_id for model_id in EQUIVALENCE_GROUPS[group] if model_id != model_name]
@@ -1,24 +1,86 @@
-from typing import List, Dict, Any, Generator
+from typing import List, Dict, Any, Generator, AsyncGenerator, Optional, Callable, Iterator
+import asyncio
+import logging
+import math
 import os
-from litellm import completion
-from ..config.models_config import SUPPORTED_MODELS, PROMPT_TEMPLATES, SYSTEM_PROMPTS
+from ..config.models_config import (
+    PREFLIGHT_SETTINGS, PROMPT_TEMPLATES, SYSTEM_PROMPTS, ROUTING_SETTINGS, get_model_config,
+    get_equivalent_models, get_prompt_caching
+)
 import streamlit as st  # Add this at the top with other imports
+from .async_runtime import iterate_async
+from .http_pool import POOLED_PROVIDERS, get_pool
+from .response_cache import ResponseCache, get_response_cache
+from .rate_limiter import MAX_RATE_LIMIT_RETRIES, get_scheduler, is_rate_limit_error
+from .metrics import RequestTimer
+from .tokenizer_backends import get_backend
+from .chunks import StreamChunk, anormalize_stream, normalize_response, normalize_stream
+
+logger = logging.getLogger(__name__)
+
+# Characters per chunk when a cached response is replayed as a stream
+REPLAY_CHUNK_CHARS = 64
+
+# Anthropic-style marker for a prompt-cache breakpoint, honoured by OpenRouter
+CACHE_CONTROL = {"type": "ephemeral"}
+
+# Formatted messages remembered per handler by message ID; the oldest are dropped first
+FORMAT_CACHE_SIZE = 4096
+
+# litellm.completion/acompletion, imported on first use (see load_litellm)
+completion = None
+acompletion = None
+
+
+def load_litellm():
+    """Import LiteLLM's entry points on first use; it is by far the slowest import in the app."""
+    global completion, acompletion
+    if completion is None or acompletion is None:
+        import litellm
+        completion = completion or litellm.completion
+        acompletion = acompletion or litellm.acompletion
+
+
+class ContextWindowError(ValueError):
+    """A prompt that leaves too little of the model's context window for a response.
+
+    Raised by the preflight check, before the request is queued or sent to the provider.
+    """
+
+    def __init__(self, model_name: str, prompt_tokens: int, context_length: int, available: int):
+        super().__init__(
+            f"The prompt (about {prompt_tokens:,} tokens) leaves only {max(available, 0):,} of "
+            f"{model_name}'s {context_length:,}-token context window for the response"
+        )
+        self.prompt_tokens = prompt_tokens
+        self.context_length = context_length
+        self.available = available
 
 class APIHandler:
-    def __init__(self, model_name: str):
+    def __init__(self, model_name: str, use_async: bool = True):
         self.model_name = model_name
+        self.use_async = use_async
+        self.last_served_by = model_name
+        self.last_cached = False
+        self.last_max_tokens = None
+        self._alternate_handlers = None
         self.model_config = self._get_model_config()
         self.provider = self.model_config["provider"]
+        self.prompt_caching = get_prompt_caching(self.model_name)
+        # message id -> (content, formatted message), valid for _format_template
+        self._format_cache = {}
+        self._format_template = None
+        self._formatted_system = None
+        # (system prompt, input list, its length and last message, formatted list) of the previous call
+        self._last_format = None
+        self.count_tokens = get_backend(self.model_config.get("tokenizer")).count
+        # (system prompt, token count) of the last system prompt counted
+        self._system_prompt_tokens = None
         self._setup_api_keys()
 
     def _get_model_config(self) -> Dict[str, Any]:
         """Get the configuration for the current model."""
-        for provider, companies in SUPPORTED_MODELS.items():
-            for company, models in companies.items():
-                for model_id, config in models.items():
-                    if model_id == self.model_name:
-                        return config
-        raise ValueError(f"Model {self.model_name} not found in configuration")
+        return get_model_config(self.model_name)
 
     def _setup_api_keys(self):
         """Setup API keys for the provider."""
@@ -33,162 +95,551 @@ class APIHandler:
                 raise ValueError("GEMINI_API_KEY environment variable not set")
 
     def _format_messages(self, messages: List[Dict[str, str]], system_prompt: str = None) -> List[Dict[str, str]]:
-        """Format messages according to the model's template."""
+        """Format messages according to the model's template.
+
+        The output depends only on the messages and system prompt, so the formatted prefix of a
+        conversation is byte-for-byte identical from one turn to the next and can be prompt-cached.
+
+        Formatting is incremental: when ``messages`` is the list of the previous call with
+        messages appended, only those are formatted and added to the previous output, at a cost
+        independent of the conversation length. Otherwise (e.g. after older turns were evicted)
+        messages with an ``id`` are looked up in a per-message cache. Both are dropped when the
+        provider's template changes. Messages must not be modified once formatted, and neither
+        the returned list, which the next call may extend, nor its dicts may be modified.
+        """
         template = PROMPT_TEMPLATES[self.provider]
+        template_key = tuple((role, parts["pre_message"], parts["post_message"]) for role, parts in template.items())
+        if template_key != self._format_template:
+            self._format_cache.clear()
+            self._formatted_system = None
+            self._last_format = None
+            self._format_template = template_key
+
+        last = self._last_format
+        if last is not None and last[0] == system_prompt and messages is last[1]:
+            _, _, previous, last_message, formatted_messages = last
+            # Messages are only appended or evicted as slices, so when the previous last message is
+            # still in its place nothing before it changed either
+            if len(messages) >= previous and (previous == 0 or messages[previous - 1] is last_message):
+                formatted_messages += self._format_each(template, messages[previous:])
+                self._last_format = (system_prompt, messages, len(messages), messages[-1] if messages else None,
+                                     formatted_messages)
+                return formatted_messages
+
         formatted_messages = []
 
         # Add system message if provided
         if system_prompt:
-            formatted_messages.append({
-                "role": "system",
-                "content": f"{template['system']['pre_message']}{system_prompt}{template['system']['post_message']}"
-            })
-
-        # Format user and assistant messages
-        for msg in messages:
-            if msg["role"] in ["user", "assistant"]:
-                formatted_messages.append({
-                    "role": msg["role"],
-                    "content": f"{template[msg['role']]['pre_message']}{msg['content']}{template[msg['role']]['post_message']}"
+            if self._formatted_system is None or self._formatted_system[0] != system_prompt:
+                self._formatted_system = (system_prompt, {
+                    "role": "system",
+                    "content": f"{template['system']['pre_message']}{system_prompt}{template['system']['post_message']}"
                 })
+            formatted_messages.append(self._formatted_system[1])
 
+        formatted_messages += self._format_each(template, messages)
+        self._last_format = (system_prompt, messages, len(messages), messages[-1] if messages else None,
+                             formatted_messages)
         return formatted_messages
 
-    def generate_response(
+    def _format_each(self, template: Dict[str, Any], messages: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Format user and assistant messages, and in-conversation system notes such as a memory summary."""
+        formatted_messages = []
+        cache = self._format_cache
+        for msg in messages:
+            role = msg["role"]
+            if role not in ("system", "user", "assistant"):
+                continue
+            message_id = msg.get("id")
+            if message_id is not None:
+                cached = cache.get(message_id)
+                # Stored messages never change; the content check guards against reused IDs
+                if cached is not None and cached[0] == msg["content"]:
+                    formatted_messages.append(cached[1])
+                    continue
+            formatted = {
+                "role": role,
+                "content": f"{template[role]['pre_message']}{msg['content']}{template[role]['post_message']}"
+            }
+            if message_id is not None:
+                cache[message_id] = (msg["content"], formatted)
+                if len(cache) > FORMAT_CACHE_SIZE:
+                    del cache[next(iter(cache))]
+            formatted_messages.append(formatted)
+        return formatted_messages
+
+    def _mark_cache_breakpoints(self, formatted_messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Mark prompt-cache breakpoints on the system prompt, the previous user turn and the newest message.
+
+        The newest message writes the conversation so far to the cache; the previous user turn is
+        where the last request's cache entry ends, so it is read back from there.
+        """
+        breakpoints = set()
+        system = [i for i, msg in enumerate(formatted_messages) if msg["role"] == "system"]
+        if system:
+            breakpoints.add(system[0])
+        users = [i for i, msg in enumerate(formatted_messages) if msg["role"] == "user"]
+        if len(users) > 1:
+            breakpoints.add(users[-2])
+        if formatted_messages:
+            breakpoints.add(len(formatted_messages) - 1)
+        return [
+            {
+                "role": msg["role"],
+                "content": [{"type": "text", "text": msg["content"], "cache_control": CACHE_CONTROL}]
+            } if i in breakpoints else msg
+            for i, msg in enumerate(formatted_messages)
+        ]
+
+    def _prepare_request(
         self,
         messages: List[Dict[str, str]],
         temperature: float = None,
         max_tokens: int = None,
         stream: bool = True,
-        system_prompt: str = None
-    ) -> Generator[Dict[str, Any], None, None]:
-        """Generate a response from the model."""
+        system_prompt: str = None,
+        use_async: bool = False
+    ) -> Dict[str, Any]:
+        """Build the provider-specific completion kwargs for a request."""
+        # Not every model sets defaults; fall back to the sidebar's
         if temperature is None:
-            temperature = self.model_config["default_temperature"]
+            temperature = self.model_config.get("default_temperature", 0.3)
         if max_tokens is None:
-            max_tokens = self.model_config["default_max_tokens"]
+            max_tokens = min(self.model_config.get("default_max_tokens", 4000), self.model_config["context_length"])
 
         # Use model-specific system prompt if available
         if system_prompt is None and "model_type" in self.model_config:
             system_prompt = self.get_default_system_prompt()
 
         formatted_messages = self._format_messages(messages, system_prompt)
+        if self.prompt_caching.get("mode") == "cache_control":
+            formatted_messages = self._mark_cache_breakpoints(formatted_messages)
 
-        try:
-            # Add specific configuration for OpenRouter
-            if self.provider == "openrouter":
-                # Create the completion request with OpenRouter-specific parameters
-                completion_kwargs = {
-                    "model": self.model_name,
-                    "messages": formatted_messages,
-                    "temperature": temperature,
-                    "max_tokens": max_tokens,
-                    "stream": stream,
-                    "drop_params": True,  # Drop unsupported parameters
-                    "extra_body": {
-                        "reasoning": {
-                            "effort": "high",
-                            "exclude": False,
-                            "format": "markdown"  # Request reasoning in markdown format
-                        }
+        completion_kwargs = {
+            "model": self.model_name,
+            "messages": formatted_messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": stream
+        }
+        # The final chunk then reports token usage, including prompt tokens served from the provider's cache
+        if stream and self.prompt_caching.get("stream_usage"):
+            completion_kwargs["stream_options"] = {"include_usage": True}
+        # Add specific configuration for OpenRouter
+        if self.provider == "openrouter":
+            completion_kwargs.update({
+                "drop_params": True,  # Drop unsupported parameters
+                "extra_body": {
+                    "reasoning": {
+                        "effort": "high",
+                        "exclude": False,
+                        "format": "markdown"  # Request reasoning in markdown format
                     }
                 }
-                
-                response = completion(**completion_kwargs)
-            # Add specific configuration for Replicate
-            elif self.provider == "replicate":
-                response = completion(
-                    model=self.model_name,
-                    messages=formatted_messages,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                    stream=stream,
-                    max_retries=3,  # Add retries for reliability
-                    timeout=120  # Increase timeout for longer responses
-                )
-            else:
-                response = completion(
-                    model=self.model_name,
-                    messages=formatted_messages,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                    stream=stream
-                )
+            })
+        # Add specific configuration for Replicate
+        elif self.provider == "replicate":
+            completion_kwargs.update({
+                "max_retries": 3,  # Add retries for reliability
+                "timeout": 120  # Increase timeout for longer responses
+            })
+        # Reuse the provider's keep-alive connections instead of a fresh handshake per turn
+        if self.provider in POOLED_PROVIDERS:
+            completion_kwargs["client"] = get_pool(self.provider).client_for(use_async)
+        return completion_kwargs
 
-            if stream:
-                for chunk in response:
-                    # Handle different response formats
-                    content = None
-                    reasoning = None
-                    thinking_blocks = None
-                    
-                    # Extract content and reasoning from different response formats
-                    if hasattr(chunk, 'choices') and chunk.choices:
-                        if hasattr(chunk.choices[0], 'delta'):
-                            if hasattr(chunk.choices[0].delta, 'content'):
-                                content = chunk.choices[0].delta.content
-                            if hasattr(chunk.choices[0].delta, 'reasoning_content'):
-                                reasoning = chunk.choices[0].delta.reasoning_content
-                            if hasattr(chunk.choices[0].delta, 'thinking_blocks'):
-                                thinking_blocks = chunk.choices[0].delta.thinking_blocks
-                            # Check for reasoning in provider_specific_fields
-                            if hasattr(chunk.choices[0].delta, 'provider_specific_fields'):
-                                provider_fields = chunk.choices[0].delta.provider_specific_fields
-                                if provider_fields is not None:
-                                    if isinstance(provider_fields, dict):
-                                        reasoning = provider_fields.get('reasoning_content', '')
-                        elif hasattr(chunk.choices[0], 'text'):
-                            content = chunk.choices[0].text
-                        elif hasattr(chunk.choices[0], 'content'):
-                            content = chunk.choices[0].content
-                    elif isinstance(chunk, dict):
-                        if 'choices' in chunk and chunk['choices']:
-                            if 'delta' in chunk['choices'][0]:
-                                delta = chunk['choices'][0]['delta']
-                                content = delta.get('content', '')
-                                reasoning = delta.get('reasoning_content', '')
-                                thinking_blocks = delta.get('thinking_blocks', [])
-                                # Check for reasoning in provider_specific_fields
-                                provider_fields = delta.get('provider_specific_fields')
-                                if provider_fields is not None:
-                                    if isinstance(provider_fields, dict):
-                                        reasoning = provider_fields.get('reasoning_content', '')
-                            elif 'text' in chunk['choices'][0]:
-                                content = chunk['choices'][0]['text']
-                            elif 'content' in chunk['choices'][0]:
-                                content = chunk['choices'][0]['content']
-                        elif 'content' in chunk:
-                            content = chunk['content']
-                    elif isinstance(chunk, str):
-                        content = chunk.strip()
-                    elif hasattr(chunk, 'content'):
-                        content = chunk.content
-
-                    # If we have any content, reasoning, or thinking blocks, yield it
-                    if content or reasoning or thinking_blocks:
-                        yield {
-                            "choices": [{
-                                "delta": {
-                                    "content": content if content else "",
-                                    "reasoning": reasoning if reasoning else "",
-                                    "thinking_blocks": thinking_blocks if thinking_blocks else []
-                                }
-                            }]
-                        }
+    def _stream(self, completion_kwargs: Dict[str, Any], timer: RequestTimer = None) -> Generator[StreamChunk, None, None]:
+        """Call the provider synchronously and yield normalized chunks."""
+        try:
+            load_litellm()
+            response = completion(**completion_kwargs)
+            if timer is not None:
+                timer.mark_connected()
+
+            if completion_kwargs["stream"]:
+                yield from normalize_stream(response)
             else:
-                if hasattr(response, 'choices') and response.choices:
-                    yield response
-                elif isinstance(response, str) and response.strip():
-                    yield {
-                        "choices": [{
-                            "message": {"content": response}
-                        }]
-                    }
+                parsed = normalize_response(response)
+                if parsed is not None:
+                    yield parsed
 
         except Exception as e:
             print(f"Debug - Error in generate_response: {str(e)}")  # Add debug print
             raise Exception(f"Error generating response: {str(e)}")
 
+    async def _astream(self, completion_kwargs: Dict[str, Any], timer: RequestTimer = None) -> AsyncGenerator[StreamChunk, None]:
+        """Call the provider with litellm.acompletion and yield normalized chunks."""
+        try:
+            load_litellm()
+            response = await acompletion(**completion_kwargs)
+            if timer is not None:
+                timer.mark_connected()
+
+            if completion_kwargs["stream"]:
+                async for chunk in anormalize_stream(response):
+                    yield chunk
+            else:
+                parsed = normalize_response(response)
+                if parsed is not None:
+                    yield parsed
+
+        except Exception as e:
+            print(f"Debug - Error in _astream: {str(e)}")  # Add debug print
+            raise Exception(f"Error generating response: {str(e)}")
+
+    def _replay_cached(self, cached: Dict[str, str], stream: bool) -> Generator[StreamChunk, None, None]:
+        """Replay a cached response in the same chunk format as a live one."""
+        if not stream:
+            yield StreamChunk(cached["content"], cached["reasoning"])
+            return
+        if cached["reasoning"]:
+            yield StreamChunk(reasoning=cached["reasoning"])
+        content = cached["content"]
+        for i in range(0, len(content), REPLAY_CHUNK_CHARS):
+            yield StreamChunk(content[i:i + REPLAY_CHUNK_CHARS])
+
+    def _record_response(
+        self,
+        chunks: Generator[StreamChunk, None, None],
+        cache_key: str
+    ) -> Generator[StreamChunk, None, None]:
+        """Pass chunks through and cache the full response once the stream completes."""
+        content = []
+        reasoning = []
+        for chunk in chunks:
+            content.append(chunk.content)
+            reasoning.append(chunk.reasoning)
+            yield chunk
+        if content:
+            get_response_cache().set(cache_key, "".join(content), "".join(reasoning))
+
+    def estimate_prompt_tokens(self, messages: List[Dict[str, Any]], system_prompt: str = None) -> int:
+        """Estimate prompt tokens from the counts Tokenizer cached on each message.
+
+        Messages without a cached count and the system prompt are counted with the model's
+        tokenizer, and every message adds PREFLIGHT_SETTINGS["message_overhead"] template tokens.
+        """
+        tokens = sum(msg["tokens"] if "tokens" in msg else self.count_tokens(msg.get("content", "")) for msg in messages)
+        if system_prompt:
+            if self._system_prompt_tokens is None or self._system_prompt_tokens[0] != system_prompt:
+                self._system_prompt_tokens = (system_prompt, self.count_tokens(system_prompt))
+            tokens += self._system_prompt_tokens[1]
+        return tokens + PREFLIGHT_SETTINGS["message_overhead"] * (len(messages) + bool(system_prompt))
+
+    def available_completion_tokens(self, prompt_tokens: int) -> Optional[int]:
+        """Tokens of the context window left for the response after the (padded) prompt, or None if unknown."""
+        context_length = self.model_config.get("context_length")
+        if context_length is None:
+            return None
+        return context_length - math.ceil(prompt_tokens * (1 + PREFLIGHT_SETTINGS["margin"]))
+
+    def prompt_overflow(self, messages: List[Dict[str, Any]], system_prompt: str = None) -> int:
+        """Prompt tokens to drop so the response gets min_completion_tokens of the context window; 0 if it fits."""
+        context_length = self.model_config.get("context_length")
+        if context_length is None:
+            return 0
+        if system_prompt is None and "model_type" in self.model_config:
+            system_prompt = self.get_default_system_prompt()
+        prompt_limit = (context_length - PREFLIGHT_SETTINGS["min_completion_tokens"]) / (1 + PREFLIGHT_SETTINGS["margin"])
+        return max(math.ceil(self.estimate_prompt_tokens(messages, system_prompt) - prompt_limit), 0)
+
+    def preflight(self, prompt_tokens: int, max_tokens: int) -> int:
+        """Clamp ``max_tokens`` to the context window left after the prompt.
+
+        Raises ContextWindowError when less than ``max_tokens`` and less than
+        min_completion_tokens would be left, so the request never reaches the provider.
+        """
+        available = self.available_completion_tokens(prompt_tokens)
+        if available is None:
+            return max_tokens
+        if available < min(max_tokens, PREFLIGHT_SETTINGS["min_completion_tokens"]):
+            raise ContextWindowError(self.model_name, prompt_tokens, self.model_config["context_length"], available)
+        return min(max_tokens, available)
+
+    def _alternates(self) -> List["APIHandler"]:
+        """Get handlers for equivalent models on other providers whose API keys are configured."""
+        if self._alternate_handlers is None:
+            self._alternate_handlers = []
+            for model_name in get_equivalent_models(self.model_name):
+                try:
+                    self._alternate_handlers.append(APIHandler(model_name, use_async=True))
+                except ValueError:
+                    continue  # No API key for that provider
+        return self._alternate_handlers
+
+    async def _arouted(
+        self,
+        candidates: List[Any],
+        hedge_after: Optional[float],
+        first_token_timeout: float,
+        timer: RequestTimer = None
+    ) -> AsyncGenerator[StreamChunk, None]:
+        """Stream from the first of several (handler, completion_kwargs) candidates to produce a token.
+
+        Failover (``hedge_after`` None) moves to the next candidate when the current one errors or
+        shows no first token within ``first_token_timeout``. Hedging additionally starts the next
+        candidate alongside the current one once ``hedge_after`` seconds pass without a first
+        token. The first stream to yield a chunk wins and the others are cancelled.
+        """
+        remaining = list(candidates)
+        pending = {}
+        last_error = None
+
+        def launch():
+            handler, completion_kwargs = remaining.pop(0)
+            stream = handler._astream(completion_kwargs, timer)
+            pending[asyncio.ensure_future(stream.__anext__())] = (handler, stream)
+
+        async def cancel(task, stream):
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+            try:
+                await stream.aclose()
+            except Exception:
+                pass
+
+        launch()
+        while pending:
+            timeout = hedge_after if hedge_after is not None and remaining else first_token_timeout
+            done, _ = await asyncio.wait(list(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                if hedge_after is None or not remaining:
+                    # Failover: abandon the slow provider(s)
+                    for task, (handler, stream) in list(pending.items()):
+                        del pending[task]
+                        await cancel(task, stream)
+                        last_error = TimeoutError(f"No first token from {handler.model_name} within {timeout}s")
+                if remaining:
+                    launch()
+                continue
+            for task in done:
+                handler, stream = pending.pop(task)
+                try:
+                    first_chunk = task.result()
+                except StopAsyncIteration:
+                    last_error = Exception(f"Empty response from {handler.model_name}")
+                except Exception as e:
+                    last_error = e
+                else:
+                    for other_task, (_, other_stream) in list(pending.items()):
+                        await cancel(other_task, other_stream)
+                    pending.clear()
+                    self.last_served_by = handler.model_name
+                    yield first_chunk
+                    async for chunk in stream:
+                        yield chunk
+                    return
+                if remaining and not pending:
+                    launch()
+        raise last_error or Exception("No provider produced a response")
+
+    def _routed_candidates(
+        self,
+        completion_kwargs: Dict[str, Any],
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str]
+    ) -> List[Any]:
+        """Build (handler, completion_kwargs) pairs: this model first, then its configured equivalents."""
+        candidates = [(self, completion_kwargs)]
+        for handler in self._alternates():
+            try:
+                max_tokens = handler.preflight(
+                    handler.estimate_prompt_tokens(messages, system_prompt), completion_kwargs["max_tokens"]
+                )
+            except ContextWindowError:
+                continue  # The prompt does not fit this provider's context window
+            candidates.append((handler, handler._prepare_request(
+                messages,
+                completion_kwargs["temperature"],
+                max_tokens,
+                completion_kwargs["stream"],
+                system_prompt,
+                use_async=True
+            )))
+        return candidates
+
+    def _scheduled_stream(
+        self,
+        make_chunks: Callable[[], Iterator[StreamChunk]],
+        max_tokens: int,
+        prompt_tokens: int,
+        session_id: str,
+        on_queued: Callable[[int, float], None] = None,
+        timer: RequestTimer = None
+    ) -> Generator[StreamChunk, None, None]:
+        """Wait for rate-limit capacity, then stream; retry 429s that arrive before the first chunk.
+
+        Only the prompt and a bounded completion estimate are reserved up front (see
+        RequestScheduler.reservation); the difference to the tokens used is settled on release.
+        """
+        scheduler = get_scheduler(self.provider, self.model_name)
+        # The prompt plus a bounded completion estimate; the actual use is reconciled on release
+        reserved = scheduler.reservation(prompt_tokens, max_tokens)
+        attempt = 0
+        while True:
+            ticket = scheduler.acquire(session_id, reserved, on_wait=on_queued)
+            if timer is not None:
+                timer.mark_sent(ticket.wait_time)
+            output_chars = 0
+            usage = None
+            received = False
+            try:
+                for chunk in make_chunks():
+                    received = True
+                    output_chars += len(chunk.content) + len(chunk.reasoning)
+                    if chunk.usage is not None:
+                        usage = chunk.usage
+                    yield chunk
+                return
+            except Exception as e:
+                if received or attempt >= MAX_RATE_LIMIT_RETRIES or not is_rate_limit_error(e):
+                    raise
+                delay = scheduler.backoff(attempt)
+                # Counted in the scheduler's rate_limited stat by backoff()
+                logger.info("Rate limited by %s, retrying in %.1fs", self.provider, delay)
+                attempt += 1
+            finally:
+                # Charge what the request used: provider-reported usage, else an estimate
+                if usage is not None:
+                    used = usage["prompt_tokens"] + usage["completion_tokens"]
+                else:
+                    used = prompt_tokens + output_chars // 4
+                scheduler.release(ticket, used)
+
+    def _instrumented(
+        self,
+        chunks: Generator[StreamChunk, None, None],
+        timer: RequestTimer
+    ) -> Generator[StreamChunk, None, None]:
+        """Time every chunk and record the request in the process-wide metrics when it ends.
+
+        Usage-only chunks are consumed here: their token counts go to the timer, not the caller.
+        """
+        try:
+            for chunk in chunks:
+                if chunk.usage is not None:
+                    timer.on_usage(chunk.usage)
+                    if not (chunk.content or chunk.reasoning or chunk.thinking):
+                        continue
+                timer.on_chunk(chunk.content + chunk.reasoning)
+                yield chunk
+        except GeneratorExit:
+            timer.served_by = self.last_served_by
+            timer.finish(asyncio.CancelledError())
+            raise
+        except Exception as e:
+            timer.served_by = self.last_served_by
+            timer.finish(e)
+            raise
+        timer.served_by = self.last_served_by
+        timer.finish()
+
+    def generate_response(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = None,
+        max_tokens: int = None,
+        stream: bool = True,
+        system_prompt: str = None,
+        allow_cache: bool = False,
+        session_id: str = "default",
+        on_queued: Callable[[int, float], None] = None,
+        routing: str = "single",
+        hedge_after: float = None
+    ) -> Generator[StreamChunk, None, None]:
+        """Generate a response from the model as a stream of StreamChunk.
+
+        With ``use_async`` the request runs on the shared event loop and chunks are consumed
+        from a bounded queue, so the calling script thread never blocks on provider I/O.
+        Responses are served from and stored in the response cache at temperature 0, or at
+        any temperature when ``allow_cache`` is set. Requests are queued fairly per
+        ``session_id`` against the provider's rate limits; ``on_queued(position, waited)``
+        is called while a request waits.
+
+        ``routing`` is "single", "failover" (try equivalent models on other providers on error or
+        first-token timeout) or "hedged" (also race the next provider after ``hedge_after``
+        seconds without a first token). ``last_served_by`` records which model answered and
+        ``last_cached`` whether the response came from the cache.
+
+        A preflight check lowers ``max_tokens`` to the context window left after the prompt
+        (recorded in ``last_max_tokens``) and raises ContextWindowError, without sending the
+        request, when the prompt leaves too little room for a response.
+        """
+        requested_system_prompt = system_prompt
+        self.last_served_by = self.model_name
+        self.last_cached = False
+        self.last_max_tokens = None
+        timer = RequestTimer(self.provider, self.model_name, self.count_tokens)
+        if system_prompt is None and "model_type" in self.model_config:
+            system_prompt = self.get_default_system_prompt()
+        completion_kwargs = self._prepare_request(
+            messages, temperature, max_tokens, stream, system_prompt, use_async=self.use_async
+        )
+        prompt_tokens = self.estimate_prompt_tokens(messages, system_prompt)
+        try:
+            # Before the cache and the scheduler: a request that cannot fit never leaves the process
+            completion_kwargs["max_tokens"] = self.preflight(prompt_tokens, completion_kwargs["max_tokens"])
+        except ContextWindowError as e:
+            timer.finish(e)
+            raise
+        self.last_max_tokens = completion_kwargs["max_tokens"]
+
+        cache_key = None
+        if completion_kwargs["temperature"] == 0 or allow_cache:
+            cache_key = ResponseCache.make_key(
+                self.model_name,
+                completion_kwargs["messages"],
+                completion_kwargs["temperature"],
+                completion_kwargs["max_tokens"],
+                system_prompt
+            )
+            cached = get_response_cache().get(cache_key)
+            if cached is not None:
+                timer.cached = True
+                self.last_cached = True
+                timer.mark_sent()
+                yield from self._instrumented(self._replay_cached(cached, stream), timer)
+                return
+
+        if routing != "single" and self._alternates():
+            candidates = self._routed_candidates(completion_kwargs, messages, requested_system_prompt)
+            if hedge_after is None and routing == "hedged":
+                hedge_after = ROUTING_SETTINGS["hedge_after"]
+            make_chunks = lambda: iterate_async(lambda: self._arouted(
+                candidates,
+                hedge_after if routing == "hedged" else None,
+                ROUTING_SETTINGS["first_token_timeout"],
+                timer
+            ))
+        elif self.use_async:
+            make_chunks = lambda: iterate_async(lambda: self._astream(completion_kwargs, timer))
+        else:
+            make_chunks = lambda: self._stream(completion_kwargs, timer)
+
+        chunks = self._scheduled_stream(
+            make_chunks,
+            completion_kwargs["max_tokens"],
+            prompt_tokens,
+            session_id,
+            on_queued,
+            timer
+        )
+        chunks = self._instrumented(chunks, timer)
+
+        if cache_key is None:
+            yield from chunks
+        else:
+            yield from self._record_response(chunks, cache_key)
+
+    def connection_stats(self) -> Dict[str, Any]:
+        """Get request and connection reuse counts for this provider's pooled HTTP clients."""
+        if self.provider not in POOLED_PROVIDERS:
+            return {}
+        return get_pool(self.provider).stats.as_dict()
+
     def get_default_system_prompt(self) -> str:
         """Get the default system prompt for the model type."""
         if "model_type" in self.model_config:
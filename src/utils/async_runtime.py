@@ -0,0 +1,75 @@
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Callable, Coroutine, Generator
+
+_loop = None
+_loop_lock = threading.Lock()
+
+# Sentinel marking the end of a bridged async stream
+_DONE = object()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Get the process-wide event loop, starting its background thread on first use."""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="async-runtime", daemon=True)
+                thread.start()
+                _loop = loop
+    return _loop
+
+
+def run_coroutine(coro: Coroutine) -> Future:
+    """Schedule a coroutine on the shared event loop and return a concurrent Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+
+
+def iterate_async(
+    make_stream: Callable[[], AsyncIterator[Any]],
+    maxsize: int = 64,
+    poll_interval: float = 0.005
+) -> Generator[Any, None, None]:
+    """Run an async iterator on the shared loop and consume it from the calling thread.
+
+    Items travel through a bounded queue. When it is full the producer yields to the loop
+    instead of blocking it, so one slow consumer never stalls other sessions' streams.
+    Closing the generator early cancels the producer task.
+    """
+    items = queue.Queue(maxsize=maxsize)
+
+    async def put(item):
+        while True:
+            try:
+                items.put_nowait(item)
+                return
+            except queue.Full:
+                await asyncio.sleep(poll_interval)
+
+    async def pump():
+        try:
+            async for item in make_stream():
+                await put(item)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await put(e)
+            return
+        await put(_DONE)
+
+    future = run_coroutine(pump())
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        if not future.done():
+            future.cancel()
@@ -0,0 +1,248 @@
+import csv
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+from .api_handlers import APIHandler
+from .think_parser import ThinkTagParser
+from .tokenizer import Tokenizer
+
+BATCH_SETTINGS = {
+    # Requests in flight at once; provider RPM/TPM limits are enforced by the shared scheduler
+    "concurrency": int(os.environ.get("BATCH_CONCURRENCY", 4)),
+    # Rows read ahead of the running requests, per worker
+    "read_ahead": int(os.environ.get("BATCH_READ_AHEAD", 2)),
+    # Latencies kept for the percentiles; larger runs keep a uniform random sample of this size
+    "latency_samples": int(os.environ.get("BATCH_LATENCY_SAMPLES", 10000))
+}
+
+# Session the batch's requests are queued under in the rate-limit scheduler
+BATCH_SESSION_ID = "batch"
+
+
+def read_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """Lazily read prompt rows from a JSONL or CSV file.
+
+    Each row has a ``prompt`` (or, in JSONL, a ``messages`` list) and optionally ``id``,
+    ``system_prompt``, ``model``, ``temperature`` and ``max_tokens``. Rows without an ``id``
+    are numbered from 1 in file order.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            rows = ({key: value for key, value in row.items() if value not in ("", None)} for row in csv.DictReader(f))
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for number, row in enumerate(rows, start=1):
+            row.setdefault("id", number)
+            row["id"] = str(row["id"])
+            for key, convert in (("temperature", float), ("max_tokens", int)):
+                if key in row and row[key] is not None:
+                    row[key] = convert(row[key])
+            if "messages" not in row:
+                if "prompt" not in row:
+                    raise ValueError(f"Row {row['id']} of {path} has neither a prompt nor messages")
+                row["messages"] = [{"role": "user", "content": row["prompt"]}]
+            yield row
+
+
+def completed_ids(path: str, retry_errors: bool = True) -> Set[str]:
+    """IDs already written to a results file, so an interrupted run can resume after them.
+
+    A line cut short by the interruption is ignored. Rows that failed are run again unless
+    ``retry_errors`` is False.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if retry_errors and record.get("error"):
+                continue
+            done.add(str(record["id"]))
+    return done
+
+
+class BatchRunner:
+    """Runs prompt rows through APIHandler on a bounded thread pool and appends results as JSONL.
+
+    Every request goes through the same templates, rate-limit scheduler, response cache and
+    metrics as the app. Results are written in completion order and flushed one line at a
+    time, so the results file is also the checkpoint a rerun resumes from.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        temperature: float = None,
+        max_tokens: int = None,
+        system_prompt: str = None,
+        stream: bool = False,
+        allow_cache: bool = False,
+        concurrency: int = None
+    ):
+        self.model_name = model_name
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.system_prompt = system_prompt
+        # Streaming adds time to first token; only complete responses carry provider token usage
+        self.stream = stream
+        self.allow_cache = allow_cache
+        self.concurrency = concurrency or BATCH_SETTINGS["concurrency"]
+        self._local = threading.local()
+        self._tokenizers = {}
+        # Fail on an unknown model or missing API key before any row is read
+        APIHandler(model_name, use_async=False)
+
+    def _handler(self, model_name: str) -> APIHandler:
+        """Per-thread handlers: a handler keeps per-request state such as last_cached."""
+        handlers = self._local.__dict__.setdefault("handlers", {})
+        if model_name not in handlers:
+            handlers[model_name] = APIHandler(model_name, use_async=False)
+        return handlers[model_name]
+
+    def _tokenizer(self, model_name: str) -> Tokenizer:
+        if model_name not in self._tokenizers:
+            self._tokenizers[model_name] = Tokenizer(model_name)
+        return self._tokenizers[model_name]
+
+    def run_row(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Send one row and return its result record; errors are recorded, not raised."""
+        model_name = row.get("model") or self.model_name
+        system_prompt = row.get("system_prompt", self.system_prompt)
+        record = {"id": row["id"], "model": model_name}
+        start = time.perf_counter()
+        ttft = None
+        usage = None
+        parser = ThinkTagParser()
+        content, reasoning = [], []
+        try:
+            handler = self._handler(model_name)
+            for chunk in handler.generate_response(
+                messages=row["messages"],
+                temperature=row.get("temperature", self.temperature),
+                max_tokens=row.get("max_tokens", self.max_tokens),
+                stream=self.stream,
+                system_prompt=system_prompt,
+                allow_cache=self.allow_cache,
+                session_id=BATCH_SESSION_ID
+            ):
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                thinking, text = parser.feed(chunk.content) if chunk.content else ("", "")
+                content.append(text)
+                reasoning.append(chunk.reasoning + thinking)
+                if chunk.usage is not None:
+                    usage = chunk.usage
+            thinking, text = parser.flush()
+            content.append(text)
+            reasoning.append(thinking)
+            record["cached"] = handler.last_cached
+            if handler.last_served_by != model_name:
+                record["served_by"] = handler.last_served_by
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        record["latency_s"] = round(time.perf_counter() - start, 4)
+        if self.stream and ttft is not None:
+            record["ttft_s"] = round(ttft, 4)
+        record["response"] = "".join(content).strip()
+        record["reasoning"] = "".join(reasoning).strip()
+        try:
+            record.update(self._usage(model_name, row["messages"], system_prompt, record, usage))
+        except ValueError:
+            # Unknown model; the error is already recorded
+            record.update(prompt_tokens=0, completion_tokens=0, cached_prompt_tokens=0, usage_source=None)
+        return record
+
+    def _usage(
+        self,
+        model_name: str,
+        messages: List[Dict[str, Any]],
+        system_prompt: Optional[str],
+        record: Dict[str, Any],
+        usage: Optional[Dict[str, int]]
+    ) -> Dict[str, Any]:
+        """Provider-reported token usage, or counts from the model's tokenizer when there is none."""
+        if usage is not None:
+            return {
+                "prompt_tokens": usage["prompt_tokens"],
+                "completion_tokens": usage["completion_tokens"],
+                "cached_prompt_tokens": usage["cached_tokens"],
+                "usage_source": "provider"
+            }
+        tokenizer = self._tokenizer(model_name)
+        prompt_tokens = tokenizer.count_conversation_tokens(messages)
+        if system_prompt:
+            prompt_tokens += tokenizer.count_message_tokens({"role": "system", "content": system_prompt})
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": tokenizer.count_tokens(record["response"] + record["reasoning"]),
+            "cached_prompt_tokens": 0,
+            "usage_source": "tokenizer"
+        }
+
+    def run(
+        self,
+        rows: Iterator[Dict[str, Any]],
+        output_path: str,
+        skip: Set[str] = frozenset(),
+        on_result: Callable[[Dict[str, Any], Dict[str, Any]], None] = None
+    ) -> Dict[str, Any]:
+        """Run every row not in ``skip`` and append its record to ``output_path``; return run totals.
+
+        At most ``concurrency * read_ahead`` rows are read ahead of the results, and
+        ``totals["latencies"]`` holds at most ``latency_samples`` of the latencies. On
+        KeyboardInterrupt, rows not yet started are dropped, the running ones are finished and
+        written, and the interrupt is re-raised.
+        """
+        totals = {"written": 0, "errors": 0, "skipped": 0, "latencies": [], "prompt_tokens": 0, "completion_tokens": 0}
+        max_pending = self.concurrency * BATCH_SETTINGS["read_ahead"]
+        max_samples = BATCH_SETTINGS["latency_samples"]
+        pending: Set[Future] = set()
+
+        def write_done(done):
+            for future in done:
+                record = future.result()
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                totals["written"] += 1
+                totals["errors"] += bool(record.get("error"))
+                # Reservoir sampling keeps memory bounded however long the suite is
+                if len(totals["latencies"]) < max_samples:
+                    totals["latencies"].append(record["latency_s"])
+                else:
+                    slot = random.randrange(totals["written"])
+                    if slot < max_samples:
+                        totals["latencies"][slot] = record["latency_s"]
+                totals["prompt_tokens"] += record["prompt_tokens"]
+                totals["completion_tokens"] += record["completion_tokens"]
+                if on_result is not None:
+                    on_result(record, totals)
+
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch")
+        with open(output_path, "a", encoding="utf-8") as out:
+            try:
+                for row in rows:
+                    if row["id"] in skip:
+                        totals["skipped"] += 1
+                        continue
+                    if len(pending) >= max_pending:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        write_done(done)
+                    pending.add(executor.submit(self.run_row, row))
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    write_done(done)
+            except KeyboardInterrupt:
+                pending = {future for future in pending if not future.cancel()}
+                write_done(wait(pending).done)
+                raise
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+        return totals
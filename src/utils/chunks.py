@@ -0,0 +1,157 @@
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, Generator, Iterable, NamedTuple, Optional, Tuple
+
+
+class StreamChunk(NamedTuple):
+    """One normalized piece of a model response.
+
+    ``usage`` is only set on the chunk that reports token usage, usually the last one of a stream.
+    """
+    content: str = ""
+    reasoning: str = ""
+    thinking: Tuple[Any, ...] = ()
+    usage: Optional[Dict[str, int]] = None
+
+
+Normalizer = Callable[[Any], Optional[StreamChunk]]
+
+
+def _make_chunk(content: Optional[str], reasoning: Optional[str] = None, thinking: Any = None) -> Optional[StreamChunk]:
+    if content or reasoning or thinking:
+        return StreamChunk(content or "", reasoning or "", tuple(thinking) if thinking else ())
+    return None
+
+
+def normalize_usage(usage: Any) -> Optional[Dict[str, int]]:
+    """Prompt, completion and prompt-cache token counts from an OpenAI-style usage object or dict."""
+    if not usage:
+        return None
+    if isinstance(usage, dict):
+        get = usage.get
+    else:
+        get = lambda name: getattr(usage, name, None)
+    details = get("prompt_tokens_details")
+    if isinstance(details, dict):
+        cached = details.get("cached_tokens")
+    else:
+        cached = getattr(details, "cached_tokens", None)
+    return {
+        "prompt_tokens": get("prompt_tokens") or 0,
+        "completion_tokens": get("completion_tokens") or 0,
+        # Anthropic-style counts, as passed through by OpenRouter
+        "cached_tokens": cached or get("cache_read_input_tokens") or 0,
+        "cache_write_tokens": get("cache_creation_input_tokens") or 0
+    }
+
+
+def _usage_chunk(usage: Any) -> Optional[StreamChunk]:
+    usage = normalize_usage(usage)
+    # Some streams attach an all-zero usage object to every chunk until the last one
+    if usage and (usage["prompt_tokens"] or usage["completion_tokens"]):
+        return StreamChunk(usage=usage)
+    return None
+
+
+def _from_object(chunk: Any) -> Optional[StreamChunk]:
+    """LiteLLM stream objects: ``choices[0].delta`` with optional reasoning fields."""
+    choices = chunk.choices
+    if not choices:
+        return _usage_chunk(getattr(chunk, "usage", None))
+    choice = choices[0]
+    delta = getattr(choice, "delta", None)
+    if delta is None:
+        return _make_chunk(getattr(choice, "text", None) or getattr(choice, "content", None))
+    reasoning = getattr(delta, "reasoning_content", None)
+    if not reasoning:
+        # Some providers only report reasoning in provider_specific_fields
+        provider_fields = getattr(delta, "provider_specific_fields", None)
+        if isinstance(provider_fields, dict):
+            reasoning = provider_fields.get("reasoning_content")
+    parsed = _make_chunk(getattr(delta, "content", None), reasoning, getattr(delta, "thinking_blocks", None))
+    if parsed is None:
+        # Usage arrives on a final chunk with an empty delta; content chunks skip the lookup
+        return _usage_chunk(getattr(chunk, "usage", None))
+    return parsed
+
+
+def _from_dict(chunk: Dict) -> Optional[StreamChunk]:
+    """Plain dicts in the OpenAI delta format, or ``{"content": ...}``."""
+    choices = chunk.get("choices")
+    if not choices:
+        return _make_chunk(chunk.get("content")) or _usage_chunk(chunk.get("usage"))
+    choice = choices[0]
+    delta = choice.get("delta")
+    if delta is None:
+        return _make_chunk(choice.get("text") or choice.get("content"))
+    reasoning = delta.get("reasoning_content")
+    if not reasoning:
+        provider_fields = delta.get("provider_specific_fields")
+        if isinstance(provider_fields, dict):
+            reasoning = provider_fields.get("reasoning_content")
+    parsed = _make_chunk(delta.get("content"), reasoning, delta.get("thinking_blocks"))
+    if parsed is None:
+        return _usage_chunk(chunk.get("usage"))
+    return parsed
+
+
+def _from_str(chunk: str) -> Optional[StreamChunk]:
+    return StreamChunk(chunk) if chunk else None
+
+
+def _from_content_attr(chunk: Any) -> Optional[StreamChunk]:
+    return _make_chunk(getattr(chunk, "content", None))
+
+
+def select_normalizer(chunk: Any) -> Normalizer:
+    """Pick the parser for a stream from its first chunk; every chunk of a stream has the same shape."""
+    if isinstance(chunk, str):
+        return _from_str
+    if isinstance(chunk, dict):
+        return _from_dict
+    if hasattr(chunk, "choices"):
+        return _from_object
+    return _from_content_attr
+
+
+def normalize_stream(chunks: Iterable[Any]) -> Generator[StreamChunk, None, None]:
+    """Normalize a provider stream, skipping chunks that carry nothing."""
+    normalize = None
+    for chunk in chunks:
+        if normalize is None:
+            normalize = select_normalizer(chunk)
+        parsed = normalize(chunk)
+        if parsed is not None:
+            yield parsed
+
+
+async def anormalize_stream(chunks: AsyncIterator[Any]) -> AsyncGenerator[StreamChunk, None]:
+    """Async counterpart of normalize_stream."""
+    normalize = None
+    async for chunk in chunks:
+        if normalize is None:
+            normalize = select_normalizer(chunk)
+        parsed = normalize(chunk)
+        if parsed is not None:
+            yield parsed
+
+
+def normalize_response(response: Any) -> Optional[StreamChunk]:
+    """Normalize a complete (non-streamed) response into a single chunk."""
+    if isinstance(response, str):
+        return _make_chunk(response.strip())
+    if isinstance(response, dict):
+        choices = response.get("choices")
+        message = choices[0].get("message") if choices else None
+        if message is None:
+            return None
+        parsed = _make_chunk(message.get("content"), message.get("reasoning_content"))
+        usage = normalize_usage(response.get("usage"))
+    else:
+        choices = getattr(response, "choices", None)
+        if not choices:
+            return None
+        message = choices[0].message
+        parsed = _make_chunk(getattr(message, "content", None), getattr(message, "reasoning_content", None))
+        usage = normalize_usage(getattr(response, "usage", None))
+    if parsed is not None and usage is not None:
+        parsed = parsed._replace(usage=usage)
+    return parsed
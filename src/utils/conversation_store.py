@@ -0,0 +1,183 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+CONVERSATION_STORE_SETTINGS = {
+    # "sqlite" persists across reloads and restarts; "memory" only lasts for the process
+    "backend": os.environ.get("CONVERSATION_STORE", "sqlite"),
+    "path": os.environ.get("CONVERSATION_DB_PATH", "conversations.db"),
+    # Messages loaded when a conversation is opened, and per "load earlier" page
+    "recent_messages": int(os.environ.get("CONVERSATION_RECENT_MESSAGES", 50)),
+    "page_size": int(os.environ.get("CONVERSATION_PAGE_SIZE", 50))
+}
+
+
+class ConversationStore(ABC):
+    """Append-only message history per conversation ID, read back newest-first in pages.
+
+    Messages are dicts with ``role``, ``content`` and a cached ``tokens`` count. ``append``
+    assigns the message ``id``, which increases within a conversation and is the paging cursor.
+    """
+
+    @abstractmethod
+    def append(self, conversation_id: str, message: Dict[str, Any], tokenizer: str) -> int:
+        """Store a message and return its assigned ``id``."""
+
+    def load_recent(self, conversation_id: str, limit: int, tokenizer: str) -> List[Dict[str, Any]]:
+        """Get the last ``limit`` messages in chronological order."""
+        return self.load_before(conversation_id, None, limit, tokenizer)
+
+    @abstractmethod
+    def load_before(
+        self,
+        conversation_id: str,
+        before_id: Optional[int],
+        limit: int,
+        tokenizer: str
+    ) -> List[Dict[str, Any]]:
+        """Get up to ``limit`` messages older than ``before_id`` in chronological order.
+
+        Token counts are only returned when they were made with ``tokenizer``.
+        """
+
+    @abstractmethod
+    def count(self, conversation_id: str) -> int:
+        """Get the number of messages stored for the conversation."""
+
+    @abstractmethod
+    def clear(self, conversation_id: str) -> None:
+        """Delete every message of the conversation."""
+
+
+class MemoryConversationStore(ConversationStore):
+    """Process-local store for tests, benchmarks and deployments without a writable disk."""
+
+    def __init__(self):
+        self._conversations = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def append(self, conversation_id: str, message: Dict[str, Any], tokenizer: str) -> int:
+        with self._lock:
+            message_id = self._next_id
+            self._next_id += 1
+            self._conversations.setdefault(conversation_id, []).append(
+                {"id": message_id, "role": message["role"], "content": message["content"],
+                 "tokens": message.get("tokens"), "tokenizer": tokenizer}
+            )
+            return message_id
+
+    def load_before(
+        self,
+        conversation_id: str,
+        before_id: Optional[int],
+        limit: int,
+        tokenizer: str
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conversations.get(conversation_id, [])
+            if before_id is not None:
+                rows = rows[:bisect_left(rows, before_id, key=lambda row: row["id"])]
+            rows = rows[-limit:] if limit > 0 else []
+            return [_to_message(row["id"], row["role"], row["content"], row["tokens"], row["tokenizer"], tokenizer)
+                    for row in rows]
+
+    def count(self, conversation_id: str) -> int:
+        with self._lock:
+            return len(self._conversations.get(conversation_id, []))
+
+    def clear(self, conversation_id: str) -> None:
+        with self._lock:
+            self._conversations.pop(conversation_id, None)
+
+
+class SQLiteConversationStore(ConversationStore):
+    """SQLite store in WAL mode, so appends from one session never block reads from another."""
+
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # WAL keeps committed data safe from application crashes without an fsync per message
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, conversation_id TEXT NOT NULL, role TEXT NOT NULL, "
+            "content TEXT NOT NULL, tokens INTEGER, tokenizer TEXT, created REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS messages_conversation ON messages (conversation_id, id)")
+        self._db.commit()
+
+    def append(self, conversation_id: str, message: Dict[str, Any], tokenizer: str) -> int:
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO messages (conversation_id, role, content, tokens, tokenizer, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (conversation_id, message["role"], message["content"], message.get("tokens"), tokenizer, time.time())
+            )
+            self._db.commit()
+            return cursor.lastrowid
+
+    def load_before(
+        self,
+        conversation_id: str,
+        before_id: Optional[int],
+        limit: int,
+        tokenizer: str
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, role, content, tokens, tokenizer FROM messages "
+                "WHERE conversation_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (conversation_id, before_id if before_id is not None else 2 ** 63 - 1, limit)
+            ).fetchall()
+        return [_to_message(*row, tokenizer) for row in reversed(rows)]
+
+    def count(self, conversation_id: str) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM messages WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()[0]
+
+    def clear(self, conversation_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+            self._db.commit()
+
+
+def _to_message(
+    message_id: int,
+    role: str,
+    content: str,
+    tokens: Optional[int],
+    stored_tokenizer: Optional[str],
+    tokenizer: str
+) -> Dict[str, Any]:
+    message = {"id": message_id, "role": role, "content": content}
+    # Counts made with another model's vocabulary are recounted by the caller
+    if tokens is not None and stored_tokenizer == tokenizer:
+        message["tokens"] = tokens
+    return message
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_conversation_store() -> ConversationStore:
+    """Get the process-wide conversation store selected by CONVERSATION_STORE_SETTINGS."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if CONVERSATION_STORE_SETTINGS["backend"] == "memory":
+                    _store = MemoryConversationStore()
+                elif CONVERSATION_STORE_SETTINGS["backend"] == "sqlite":
+                    _store = SQLiteConversationStore(CONVERSATION_STORE_SETTINGS["path"])
+                else:
+                    raise ValueError(f"Unknown conversation store backend {CONVERSATION_STORE_SETTINGS['backend']}")
+    return _store
@@ -0,0 +1,65 @@
+import queue
+import threading
+from typing import Any, Callable, Generator, Iterator, List, NamedTuple, Optional
+
+
+class FanoutEvent(NamedTuple):
+    """An item from stream ``index``, or the end of that stream (``done``) with its error if it failed."""
+    index: int
+    item: Any = None
+    done: bool = False
+    error: Optional[BaseException] = None
+
+
+def fan_out(
+    make_streams: List[Callable[[], Iterator[Any]]],
+    maxsize: int = 256,
+    poll_interval: float = 0.05
+) -> Generator[FanoutEvent, None, None]:
+    """Consume several streams concurrently and yield their items in arrival order.
+
+    Each stream is created and iterated on its own thread, so the total time is about that of
+    the slowest stream rather than the sum. Every stream ends with exactly one ``done`` event;
+    an exception from one stream is reported in its event and does not stop the others.
+    Closing the generator early stops the producers and closes their streams.
+    """
+    events = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(event: FanoutEvent) -> bool:
+        while not stop.is_set():
+            try:
+                events.put(event, timeout=poll_interval)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def pump(index: int, make_stream: Callable[[], Iterator[Any]]):
+        stream = None
+        error = None
+        try:
+            stream = make_stream()
+            for item in stream:
+                if not put(FanoutEvent(index, item)):
+                    break
+        except Exception as e:
+            error = e
+        finally:
+            # Generators must be closed on the thread that iterates them
+            if stream is not None and hasattr(stream, "close"):
+                stream.close()
+        put(FanoutEvent(index, done=True, error=error))
+
+    for index, make_stream in enumerate(make_streams):
+        threading.Thread(target=pump, args=(index, make_stream), name=f"fanout-{index}", daemon=True).start()
+
+    remaining = len(make_streams)
+    try:
+        while remaining:
+            event = events.get()
+            if event.done:
+                remaining -= 1
+            yield event
+    finally:
+        stop.set()
@@ -0,0 +1,131 @@
+import os
+import threading
+import weakref
+from typing import Any, Dict
+import httpx
+
+# Providers whose LiteLLM route accepts a ``client=`` handler. OpenRouter and Replicate
+# ignore it and fall back to LiteLLM's own module-level clients.
+POOLED_PROVIDERS = ("groq", "gemini")
+
+HTTP_POOL_SETTINGS = {
+    "max_connections": int(os.environ.get("HTTP_POOL_MAX_CONNECTIONS", 20)),
+    "max_keepalive_connections": int(os.environ.get("HTTP_POOL_MAX_KEEPALIVE", 10)),
+    "keepalive_expiry": float(os.environ.get("HTTP_POOL_KEEPALIVE_EXPIRY", 60.0)),
+    "timeout": float(os.environ.get("HTTP_POOL_TIMEOUT", 600.0))
+}
+
+
+class PoolStats:
+    """Request and connection counters for one provider's pooled clients."""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+        self._seen = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def observe(self, connections) -> None:
+        """Record a finished request and any connections the pool has not been seen using before."""
+        with self._lock:
+            self.requests += 1
+            for connection in connections:
+                if connection not in self._seen:
+                    self._seen.add(connection)
+                    self.connections_opened += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Get the counters, including how many requests reused a kept-alive connection."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "reused": max(self.requests - self.connections_opened, 0),
+                "open_connections": len(self._seen)
+            }
+
+
+class _CountingTransport(httpx.HTTPTransport):
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        response = super().handle_request(request)
+        self.stats.observe(self._pool.connections)
+        return response
+
+
+class _CountingAsyncTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await super().handle_async_request(request)
+        self.stats.observe(self._pool.connections)
+        return response
+
+
+class ProviderPool:
+    """Keep-alive sync and async HTTP clients shared by every request to one provider."""
+
+    def __init__(self, provider: str, settings: Dict[str, Any] = None):
+        # Deferred with the rest of LiteLLM so importing this module stays cheap
+        from litellm.llms.custom_httpx.http_handler import AsyncHTTPHandler, HTTPHandler
+
+        settings = {**HTTP_POOL_SETTINGS, **(settings or {})}
+        self.provider = provider
+        self.stats = PoolStats()
+        limits = httpx.Limits(
+            max_connections=settings["max_connections"],
+            max_keepalive_connections=settings["max_keepalive_connections"],
+            keepalive_expiry=settings["keepalive_expiry"]
+        )
+        timeout = httpx.Timeout(settings["timeout"], connect=10.0)
+
+        self.sync_handler = HTTPHandler(
+            client=httpx.Client(
+                transport=_CountingTransport(self.stats, limits=limits),
+                limits=limits,
+                timeout=timeout
+            )
+        )
+        self.async_handler = AsyncHTTPHandler(timeout=timeout, concurrent_limit=settings["max_connections"])
+        # AsyncHTTPHandler always builds its own client; swap in the counting one
+        self.async_handler.client = httpx.AsyncClient(
+            transport=_CountingAsyncTransport(self.stats, limits=limits),
+            limits=limits,
+            timeout=timeout
+        )
+
+    def client_for(self, use_async: bool) -> Any:
+        """Get the LiteLLM handler to pass as ``client=`` for a sync or async call."""
+        return self.async_handler if use_async else self.sync_handler
+
+
+_pools: Dict[str, ProviderPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(provider: str) -> ProviderPool:
+    """Get the process-wide pool for a provider, creating it on first use."""
+    pool = _pools.get(provider)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(provider)
+            if pool is None:
+                pool = _pools[provider] = ProviderPool(provider)
+    return pool
+
+
+def configure_pools(**settings) -> None:
+    """Change pool settings (e.g. ``max_connections``); pools created afterwards use them."""
+    HTTP_POOL_SETTINGS.update(settings)
+    with _pools_lock:
+        _pools.clear()
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Get request, connection and reuse counts for every provider pool in use."""
+    return {provider: pool.stats.as_dict() for provider, pool in list(_pools.items())}
@@ -0,0 +1,258 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+METRICS_SETTINGS = {
+    "buffer_size": int(os.environ.get("METRICS_BUFFER_SIZE", 2000)),
+    # Append every finished request to this JSONL file when set
+    "jsonl_path": os.environ.get("METRICS_JSONL_PATH"),
+    # Serve Prometheus text on http://127.0.0.1:<port>/metrics when set
+    "port": int(os.environ["METRICS_PORT"]) if os.environ.get("METRICS_PORT") else None
+}
+
+# Per-request fields summarized as p50/p95/p99
+LATENCY_FIELDS = ("queue_wait", "connect_time", "ttft", "max_gap", "total_latency", "tokens_per_sec")
+
+
+class RequestTimer:
+    """Collects timings for one provider request from queueing to the last chunk."""
+
+    def __init__(self, provider: str, model: str, count_tokens: Callable[[str], int] = None):
+        self.provider = provider
+        self.model = model
+        self.count_tokens = count_tokens or (lambda text: len(text) // 4)
+        self.created = time.time()
+        self.started = time.perf_counter()
+        self.sent = None
+        self.connected = None
+        self.first_chunk = None
+        self.last_chunk = None
+        self.queue_wait = 0.0
+        self.chunks = 0
+        self.output_tokens = 0
+        self.gap_total = 0.0
+        self.max_gap = 0.0
+        self.cached = False
+        self.served_by = model
+        # Provider-reported usage, when the provider sends it
+        self.usage = None
+
+    def mark_sent(self, queue_wait: float = 0.0) -> None:
+        """The request left the scheduler and is going to the provider."""
+        self.queue_wait = queue_wait
+        self.sent = time.perf_counter()
+
+    def mark_connected(self) -> None:
+        """The provider accepted the request and the response stream is open."""
+        if self.connected is None:
+            self.connected = time.perf_counter()
+
+    def on_chunk(self, text: str) -> None:
+        now = time.perf_counter()
+        if self.first_chunk is None:
+            self.first_chunk = now
+        else:
+            gap = now - self.last_chunk
+            self.gap_total += gap
+            self.max_gap = max(self.max_gap, gap)
+        self.last_chunk = now
+        self.chunks += 1
+        if text:
+            self.output_tokens += self.count_tokens(text)
+
+    def on_usage(self, usage: Dict[str, int]) -> None:
+        """Token usage reported by the provider, including prompt tokens read from its prefix cache."""
+        self.usage = usage
+
+    def finish(self, error: Optional[BaseException] = None) -> Dict[str, Any]:
+        """Build the record for this request and add it to the process-wide metrics."""
+        end = time.perf_counter()
+        sent = self.sent if self.sent is not None else self.started
+        generation = (end - self.first_chunk) if self.first_chunk is not None else 0.0
+        record = {
+            "timestamp": self.created,
+            "provider": self.provider,
+            "model": self.model,
+            "served_by": self.served_by,
+            "cached": self.cached,
+            "queue_wait": self.queue_wait,
+            "connect_time": (self.connected - sent) if self.connected is not None else None,
+            "ttft": (self.first_chunk - sent) if self.first_chunk is not None else None,
+            "mean_gap": self.gap_total / (self.chunks - 1) if self.chunks > 1 else None,
+            "max_gap": self.max_gap if self.chunks > 1 else None,
+            "total_latency": end - self.started,
+            "chunks": self.chunks,
+            "output_tokens": self.output_tokens,
+            "tokens_per_sec": self.output_tokens / generation if generation > 0 else None,
+            "prompt_tokens": self.usage["prompt_tokens"] if self.usage else None,
+            "cached_prompt_tokens": self.usage["cached_tokens"] if self.usage else None,
+            "cache_write_tokens": self.usage["cache_write_tokens"] if self.usage else None,
+            "error": _error_class(error) if error is not None else None
+        }
+        get_metrics().record(record)
+        return record
+
+
+def _error_class(error: BaseException) -> str:
+    # APIHandler wraps provider errors in a plain Exception; report the original class
+    while type(error) is Exception and (error.__cause__ or error.__context__) is not None:
+        error = error.__cause__ or error.__context__
+    return type(error).__name__
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q * (len(values) - 1))))
+    return values[index]
+
+
+class MetricsRecorder:
+    """Thread-safe ring buffer of request records with percentile aggregates and exporters."""
+
+    def __init__(self, buffer_size: int = 2000, jsonl_path: Optional[str] = None):
+        self.records = deque(maxlen=buffer_size)
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+
+    def record(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self.records.append(record)
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self.records)
+
+    def aggregates(self) -> Dict[str, Dict[str, Any]]:
+        """Summarize the buffer per model: counts, error classes and p50/p95/p99 latencies."""
+        groups = {}
+        for record in self.snapshot():
+            groups.setdefault(record["model"], []).append(record)
+
+        summary = {}
+        for key, records in groups.items():
+            live = [r for r in records if not r["cached"]]
+            errors = {}
+            for r in records:
+                if r["error"]:
+                    errors[r["error"]] = errors.get(r["error"], 0) + 1
+            # Requests whose provider reported usage, split by whether part of the prompt was cached
+            reported = [r for r in live if r["prompt_tokens"]]
+            prompt_tokens = sum(r["prompt_tokens"] for r in reported)
+            cached_tokens = sum(r["cached_prompt_tokens"] for r in reported)
+            stats = {
+                "provider": records[0]["provider"],
+                "model": records[0]["model"],
+                "requests": len(records),
+                "cache_hits": len(records) - len(live),
+                "errors": errors,
+                "prompt_tokens": prompt_tokens,
+                "cached_prompt_tokens": cached_tokens,
+                "prefix_cache_ratio": cached_tokens / prompt_tokens if prompt_tokens else None,
+                "prefix_cache_requests": sum(1 for r in reported if r["cached_prompt_tokens"]),
+                # Streamed responses carry no usage (see PROMPT_CACHING["stream_usage"])
+                "usage_reported": len(reported)
+            }
+            for field in LATENCY_FIELDS:
+                values = [r[field] for r in live if r[field] is not None and not r["error"]]
+                for q in (50, 95, 99):
+                    stats[f"{field}_p{q}"] = _percentile(values, q / 100)
+            # Time to first token with and without a prefix-cache hit shows the prefill saved
+            for label, hit in (("hit", True), ("miss", False)):
+                values = [r["ttft"] for r in reported
+                          if r["ttft"] is not None and not r["error"] and bool(r["cached_prompt_tokens"]) == hit]
+                stats[f"ttft_prefix_{label}_p50"] = _percentile(values, 0.5)
+            summary[key] = stats
+        return summary
+
+    def to_prometheus(self) -> str:
+        """Render the aggregates in the Prometheus text exposition format."""
+        lines = []
+        aggregates = self.aggregates()
+        lines.append("# TYPE llm_requests_total counter")
+        for stats in aggregates.values():
+            lines.append(f'llm_requests_total{{provider="{stats["provider"]}",model="{stats["model"]}"}} {stats["requests"]}')
+        lines.append("# TYPE llm_prompt_tokens_total counter")
+        for stats in aggregates.values():
+            lines.append(f'llm_prompt_tokens_total{{provider="{stats["provider"]}",model="{stats["model"]}"}} {stats["prompt_tokens"]}')
+        lines.append("# TYPE llm_cached_prompt_tokens_total counter")
+        for stats in aggregates.values():
+            lines.append(
+                f'llm_cached_prompt_tokens_total{{provider="{stats["provider"]}",model="{stats["model"]}"}} '
+                f'{stats["cached_prompt_tokens"]}'
+            )
+        lines.append("# TYPE llm_request_errors_total counter")
+        for stats in aggregates.values():
+            for error, count in stats["errors"].items():
+                lines.append(
+                    f'llm_request_errors_total{{provider="{stats["provider"]}",model="{stats["model"]}",'
+                    f'error="{error}"}} {count}'
+                )
+        for field in LATENCY_FIELDS:
+            lines.append(f"# TYPE llm_{field} summary")
+            for stats in aggregates.values():
+                for q in (50, 95, 99):
+                    value = stats[f"{field}_p{q}"]
+                    if value is not None:
+                        lines.append(
+                            f'llm_{field}{{provider="{stats["provider"]}",model="{stats["model"]}",'
+                            f'quantile="0.{q}"}} {value:.6f}'
+                        )
+        return "\n".join(lines) + "\n"
+
+    def to_jsonl(self) -> str:
+        """Dump the buffered records as JSON lines."""
+        return "".join(json.dumps(record) + "\n" for record in self.snapshot())
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        payload = get_metrics().to_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def start_metrics_server(port: int) -> ThreadingHTTPServer:
+    """Serve Prometheus text for the process-wide metrics on localhost."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+def get_metrics() -> MetricsRecorder:
+    """Get the process-wide metrics recorder, starting the metrics endpoint if configured."""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = MetricsRecorder(METRICS_SETTINGS["buffer_size"], METRICS_SETTINGS["jsonl_path"])
+                if METRICS_SETTINGS["port"]:
+                    try:
+                        start_metrics_server(METRICS_SETTINGS["port"])
+                    except OSError as e:
+                        logger.warning("Could not start metrics endpoint on port %s: %s", METRICS_SETTINGS["port"], e)
+    return _metrics
@@ -0,0 +1,243 @@
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Optional, Tuple
+from ..config.models_config import RATE_LIMITS, get_model_config
+
+# Retry policy for provider 429s: exponential backoff with full jitter
+MAX_RATE_LIMIT_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+
+# Share of a TPM budget one request reserves for its completion before it starts. The real
+# completion length is charged or refunded when the request ends, so max_tokens (often larger
+# than the whole budget) does not make every request wait for an empty bucket.
+COMPLETION_RESERVE_SHARE = 0.1
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously up to ``capacity`` per minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` can be taken (0 if it can be taken now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+    def charge(self, amount: float, now: float) -> None:
+        """Take tokens used beyond a reservation; the level may go negative and delays later requests."""
+        self._refill(now)
+        self.level -= amount
+
+
+class Ticket:
+    """One queued request; records how long it waited for capacity."""
+
+    def __init__(self, session_id: str, tokens: int):
+        self.session_id = session_id
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.granted = None
+
+    @property
+    def wait_time(self) -> float:
+        end = self.granted if self.granted is not None else time.monotonic()
+        return end - self.enqueued
+
+
+class RequestScheduler:
+    """Rate-limits one provider/model pair with RPM and TPM buckets, serving sessions round-robin.
+
+    Each session has its own FIFO; the session at the front of the rotation is served next and
+    then moved to the back, so one busy session cannot starve the others.
+    """
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None):
+        self.rpm = TokenBucket(rpm) if rpm else None
+        self.tpm = TokenBucket(tpm) if tpm else None
+        self.paused_until = 0.0
+        self._sessions = OrderedDict()
+        self._cond = threading.Condition()
+        self._waits = deque(maxlen=256)
+        self.granted = 0
+        self.rate_limited = 0
+
+    def _head(self) -> Optional[Ticket]:
+        for tickets in self._sessions.values():
+            return tickets[0]
+        return None
+
+    def _position(self, ticket: Ticket) -> int:
+        """Approximate place in line: tickets of other sessions served before this one, plus one."""
+        position = 1
+        for session_id, tickets in self._sessions.items():
+            if session_id == ticket.session_id:
+                position += tickets.index(ticket)
+                break
+            position += 1
+        return position
+
+    def _wait_for_capacity(self, ticket: Ticket, now: float) -> float:
+        wait = max(self.paused_until - now, 0.0)
+        if self.rpm:
+            wait = max(wait, self.rpm.wait_time(1, now))
+        if self.tpm:
+            wait = max(wait, self.tpm.wait_time(ticket.tokens, now))
+        return wait
+
+    def reservation(self, prompt_tokens: int, max_tokens: Optional[int]) -> int:
+        """Tokens to reserve for a request: the prompt plus a bounded estimate of the completion."""
+        completion = max_tokens or 0
+        if self.tpm:
+            completion = min(completion, int(self.tpm.capacity * COMPLETION_RESERVE_SHARE))
+        return prompt_tokens + completion
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return sum(len(tickets) for tickets in self._sessions.values())
+
+    def acquire(
+        self,
+        session_id: str,
+        tokens: int,
+        on_wait: Callable[[int, float], None] = None,
+        report_interval: float = 0.5
+    ) -> Ticket:
+        """Block until the request may be sent, reporting (queue position, seconds waited) meanwhile."""
+        ticket = Ticket(session_id, tokens)
+        with self._cond:
+            self._sessions.setdefault(session_id, deque()).append(ticket)
+
+        try:
+            return self._wait_for_turn(ticket, on_wait, report_interval)
+        except BaseException:
+            # e.g. the Streamlit script was stopped while queued: give up the place in line
+            with self._cond:
+                tickets = self._sessions.get(session_id)
+                if tickets and ticket in tickets:
+                    tickets.remove(ticket)
+                    if not tickets:
+                        del self._sessions[session_id]
+                self._cond.notify_all()
+            raise
+
+    def _wait_for_turn(self, ticket: Ticket, on_wait: Callable[[int, float], None], report_interval: float) -> Ticket:
+        session_id = ticket.session_id
+        tokens = ticket.tokens
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                wait = report_interval
+                if self._head() is ticket:
+                    wait = self._wait_for_capacity(ticket, now)
+                    if wait <= 0:
+                        if self.rpm:
+                            self.rpm.take(1, now)
+                        if self.tpm:
+                            self.tpm.take(tokens, now)
+                        tickets = self._sessions.pop(session_id)
+                        tickets.popleft()
+                        if tickets:
+                            # Session goes to the back of the rotation
+                            self._sessions[session_id] = tickets
+                        ticket.granted = now
+                        self.granted += 1
+                        self._waits.append(ticket.wait_time)
+                        self._cond.notify_all()
+                        return ticket
+                position = self._position(ticket)
+            if on_wait is not None:
+                on_wait(position, ticket.wait_time)
+            with self._cond:
+                self._cond.wait(timeout=min(wait, report_interval))
+
+    def release(self, ticket: Ticket, used_tokens: Optional[int] = None) -> None:
+        """Reconcile the reservation with the tokens the request actually used.
+
+        Unused tokens are refunded; tokens used beyond the reservation are charged.
+        """
+        if self.tpm and used_tokens is not None and used_tokens != ticket.tokens:
+            with self._cond:
+                now = time.monotonic()
+                if used_tokens < ticket.tokens:
+                    self.tpm.give_back(ticket.tokens - used_tokens, now)
+                else:
+                    self.tpm.charge(used_tokens - ticket.tokens, now)
+                self._cond.notify_all()
+
+    def backoff(self, attempt: int) -> float:
+        """Pause this queue after a provider 429 and return the jittered delay in seconds."""
+        delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+        with self._cond:
+            self.rate_limited += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            self._cond.notify_all()
+        return delay
+
+    def stats(self) -> Dict[str, Any]:
+        """Get queue depth and recent wait times for reporting."""
+        with self._cond:
+            waits = sorted(self._waits)
+            return {
+                "queue_depth": sum(len(tickets) for tickets in self._sessions.values()),
+                "granted": self.granted,
+                "rate_limited": self.rate_limited,
+                "avg_wait": sum(waits) / len(waits) if waits else 0.0,
+                "max_wait": waits[-1] if waits else 0.0
+            }
+
+
+_schedulers: Dict[Tuple[str, str], RequestScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(provider: str, model_name: str) -> RequestScheduler:
+    """Get the process-wide scheduler for a provider/model pair.
+
+    Limits come from the model's ``rate_limits`` field, falling back to the provider
+    defaults in RATE_LIMITS.
+    """
+    key = (provider, model_name)
+    scheduler = _schedulers.get(key)
+    if scheduler is None:
+        with _schedulers_lock:
+            scheduler = _schedulers.get(key)
+            if scheduler is None:
+                limits = {**RATE_LIMITS.get(provider, {}), **get_model_config(model_name).get("rate_limits", {})}
+                scheduler = _schedulers[key] = RequestScheduler(limits.get("rpm"), limits.get("tpm"))
+    return scheduler
+
+
+def get_scheduler_stats() -> Dict[str, Dict[str, Any]]:
+    """Get stats for every scheduler in use, keyed by model name."""
+    return {model_name: scheduler.stats() for (_, model_name), scheduler in list(_schedulers.items())}
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Check an exception (and what it wraps) for a provider 429."""
+    while error is not None:
+        if getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError":
+            return True
+        error = error.__cause__ or error.__context__
+    return False
@@ -0,0 +1,51 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator
+import streamlit as st
+
+# Script runs remembered per section
+PROFILE_HISTORY = 50
+
+
+class RerunProfiler:
+    """Wall-clock time of named script sections over the last few reruns of one session."""
+
+    def __init__(self, history: int = PROFILE_HISTORY):
+        self.history = history
+        self.samples = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        self.samples.setdefault(name, deque(maxlen=self.history)).append(seconds)
+
+    @contextmanager
+    def section(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Get last/mean/max milliseconds per section."""
+        return {
+            name: {
+                "last_ms": samples[-1] * 1000,
+                "mean_ms": sum(samples) / len(samples) * 1000,
+                "max_ms": max(samples) * 1000,
+                "runs": len(samples)
+            }
+            for name, samples in self.samples.items()
+        }
+
+
+def get_profiler() -> RerunProfiler:
+    """Get this session's rerun profiler."""
+    if "rerun_profiler" not in st.session_state:
+        st.session_state.rerun_profiler = RerunProfiler()
+    return st.session_state.rerun_profiler
+
+
+def profile_section(name: str):
+    """Time a block of the script under ``name`` in this session's profiler."""
+    return get_profiler().section(name)
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+RESPONSE_CACHE_SETTINGS = {
+    "max_memory_entries": int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 256)),
+    # On-disk tier is off unless a path is configured
+    "disk_path": os.environ.get("RESPONSE_CACHE_PATH"),
+    "max_disk_entries": int(os.environ.get("RESPONSE_CACHE_MAX_DISK_ENTRIES", 10000)),
+    "ttl": float(os.environ.get("RESPONSE_CACHE_TTL", 24 * 60 * 60))
+}
+
+
+class ResponseCache:
+    """Two-tier cache of complete responses: an in-memory LRU in front of an optional SQLite store."""
+
+    def __init__(
+        self,
+        max_memory_entries: int = 256,
+        disk_path: Optional[str] = None,
+        max_disk_entries: int = 10000,
+        ttl: float = 24 * 60 * 60
+    ):
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, content TEXT, reasoning TEXT, created REAL, accessed REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._db.commit()
+
+    @staticmethod
+    def make_key(
+        model: str,
+        formatted_messages: List[Dict[str, Any]],
+        temperature: float,
+        max_tokens: int,
+        system_prompt: Optional[str]
+    ) -> str:
+        """Hash everything that determines the response into a cache key."""
+        payload = json.dumps(
+            {
+                "model": model,
+                "messages": formatted_messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "system_prompt": system_prompt
+            },
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        """Get a cached response ({"content", "reasoning"}), or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry["created"] <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT content, reasoning, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if now - row[2] <= self.ttl:
+                        self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        entry = {"content": row[0], "reasoning": row[1], "created": row[2]}
+                        self._remember(key, entry)
+                        self.hits += 1
+                        return entry
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, content: str, reasoning: str = "") -> None:
+        """Store a complete response in both tiers."""
+        now = time.time()
+        entry = {"content": content, "reasoning": reasoning, "created": now}
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, content, reasoning, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, content, reasoning, now, now)
+                )
+                # Evict expired rows, then the least recently used beyond the size limit
+                self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,)
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every cached response."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Get hit/miss counts and the in-memory size."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "memory_entries": len(self._memory)}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Get the process-wide response cache, built from RESPONSE_CACHE_SETTINGS on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(**RESPONSE_CACHE_SETTINGS)
+    return _cache
@@ -0,0 +1,136 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional
+from ..config.models_config import get_model_config
+from .api_handlers import APIHandler
+from .tokenizer_backends import get_backend
+
+SUMMARY_SETTINGS = {
+    # "truncate" drops the oldest turns when memory is full; "summarize" folds them into a running summary
+    "mode": os.environ.get("MEMORY_COMPACTION", "truncate"),
+    # A cheap, fast model; the summary never blocks the chat turn
+    "model": os.environ.get("MEMORY_SUMMARY_MODEL", "groq/llama-3.1-8b-instant"),
+    "max_tokens": int(os.environ.get("MEMORY_SUMMARY_MAX_TOKENS", 400)),
+    "workers": int(os.environ.get("MEMORY_SUMMARY_WORKERS", 2))
+}
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an assistant. "
+    "Merge the new turns into the existing summary. Keep names, facts, decisions, open questions "
+    "and the user's preferences; drop pleasantries and repetition. Write in the third person, "
+    "as compact notes, and reply with the updated summary only."
+)
+
+
+class SummaryResult(NamedTuple):
+    """An updated running summary and what producing it cost."""
+    content: str
+    prompt_tokens: int
+    completion_tokens: int
+    cached: bool
+
+
+def _transcript(messages: List[Dict[str, Any]]) -> str:
+    return "\n\n".join(f"{message['role'].capitalize()}: {message['content']}" for message in messages)
+
+
+class ConversationSummarizer:
+    """Folds evicted turns into a running summary with a cheap model on a background thread pool.
+
+    Requests go through APIHandler at temperature 0, so they share the provider's rate limits,
+    connection pool and metrics, and an identical request is answered by the response cache.
+    """
+
+    def __init__(self, model_name: str = None, workers: int = None):
+        self.model_name = model_name or SUMMARY_SETTINGS["model"]
+        self.count_tokens = get_backend(get_model_config(self.model_name).get("tokenizer")).count
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or SUMMARY_SETTINGS["workers"],
+            thread_name_prefix="summarizer"
+        )
+        self._lock = threading.Lock()
+        self._usage = {"requests": 0, "cached": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def build_messages(self, previous_summary: Optional[str], messages: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Build the summarization request for the previous summary plus newly evicted turns."""
+        parts = []
+        if previous_summary:
+            parts.append(f"Existing summary:\n{previous_summary}")
+        parts.append(f"New turns:\n{_transcript(messages)}")
+        return [{"role": "user", "content": "\n\n".join(parts)}]
+
+    def summarize(
+        self,
+        previous_summary: Optional[str],
+        messages: List[Dict[str, Any]],
+        max_tokens: int = None,
+        session_id: str = "default"
+    ) -> SummaryResult:
+        """Produce the updated summary, blocking until the model has answered."""
+        max_tokens = max_tokens or SUMMARY_SETTINGS["max_tokens"]
+        request = self.build_messages(previous_summary, messages)
+        handler = APIHandler(self.model_name)
+        content = "".join(
+            chunk.content
+            for chunk in handler.generate_response(
+                request,
+                temperature=0,
+                max_tokens=max_tokens,
+                stream=False,
+                system_prompt=SUMMARY_SYSTEM_PROMPT,
+                session_id=session_id
+            )
+        ).strip()
+        if not content:
+            raise ValueError(f"Empty summary from {self.model_name}")
+
+        if handler.last_cached:
+            result = SummaryResult(content, 0, 0, True)
+        else:
+            prompt_tokens = self.count_tokens(SUMMARY_SYSTEM_PROMPT) + self.count_tokens(request[0]["content"])
+            result = SummaryResult(content, prompt_tokens, self.count_tokens(content), False)
+        with self._lock:
+            self._usage["requests"] += 1
+            self._usage["cached"] += result.cached
+            self._usage["prompt_tokens"] += result.prompt_tokens
+            self._usage["completion_tokens"] += result.completion_tokens
+        return result
+
+    def submit(
+        self,
+        previous_summary: Optional[str],
+        messages: List[Dict[str, Any]],
+        max_tokens: int = None,
+        session_id: str = "default"
+    ) -> Future:
+        """Summarize in the background; the Future resolves to a SummaryResult."""
+        return self._executor.submit(self.summarize, previous_summary, list(messages), max_tokens, session_id)
+
+    def usage(self) -> Dict[str, int]:
+        """Get process-wide request, cache-hit and token counts for summaries."""
+        with self._lock:
+            return dict(self._usage)
+
+
+def summary_model(chat_model: str) -> str:
+    """SUMMARY_SETTINGS["model"] if its provider's API key is configured, else the chat model."""
+    model_name = SUMMARY_SETTINGS["model"]
+    provider = get_model_config(model_name)["provider"]
+    if os.environ.get(f"{provider.upper()}_API_KEY"):
+        return model_name
+    return chat_model
+
+
+_summarizers = {}
+_summarizer_lock = threading.Lock()
+
+
+def get_summarizer(model_name: str = None) -> ConversationSummarizer:
+    """Get the process-wide summarizer for ``model_name`` (default SUMMARY_SETTINGS["model"])."""
+    model_name = model_name or SUMMARY_SETTINGS["model"]
+    if model_name not in _summarizers:
+        with _summarizer_lock:
+            if model_name not in _summarizers:
+                _summarizers[model_name] = ConversationSummarizer(model_name)
+    return _summarizers[model_name]
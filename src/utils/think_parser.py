@@ -0,0 +1,52 @@
+from typing import Tuple
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+
+def _partial_tag_length(text: str, start: int, tag: str) -> int:
+    """Length of the longest suffix of text[start:] that is a proper prefix of tag."""
+    for length in range(min(len(tag) - 1, len(text) - start), 0, -1):
+        if text.endswith(tag[:length]):
+            return length
+    return 0
+
+
+class ThinkTagParser:
+    """Incrementally split streamed text into ``<think>`` reasoning and the visible response.
+
+    Tags may be split across chunks. Only the new chunk plus a held-back partial tag (at most
+    ``len("</think>") - 1`` characters) is scanned per call, so parsing stays O(chunk).
+    """
+
+    def __init__(self):
+        self.in_thinking = False
+        self._carry = ""
+
+    def feed(self, text: str) -> Tuple[str, str]:
+        """Consume a chunk and return the (thinking, response) text it completes."""
+        if self._carry:
+            text = self._carry + text
+            self._carry = ""
+        thinking = []
+        response = []
+        pos = 0
+        while True:
+            tag = THINK_CLOSE if self.in_thinking else THINK_OPEN
+            out = thinking if self.in_thinking else response
+            index = text.find(tag, pos)
+            if index == -1:
+                # Hold back a possible partial tag until the next chunk decides it
+                end = len(text) - _partial_tag_length(text, pos, tag)
+                out.append(text[pos:end])
+                self._carry = text[end:]
+                break
+            out.append(text[pos:index])
+            pos = index + len(tag)
+            self.in_thinking = not self.in_thinking
+        return "".join(thinking), "".join(response)
+
+    def flush(self) -> Tuple[str, str]:
+        """Return any held-back text at the end of the stream."""
+        carry, self._carry = self._carry, ""
+        return (carry, "") if self.in_thinking else ("", carry)
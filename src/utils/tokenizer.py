@@ -1,62 +1,98 @@
-from typing import List, Dict, Any
-import tiktoken
-from ..config.models_config import SUPPORTED_MODELS
+from array import array
+from typing import List, Dict, Any, Tuple
+from ..config.models_config import get_model_config
+from .tokenizer_backends import get_backend
+
 
 class Tokenizer:
     def __init__(self, model_name: str):
         self.model_name = model_name
-        self.encoding = tiktoken.get_encoding("cl100k_base")  # Using a common encoding
         self.model_config = self._get_model_config()
+        # Shared, process-wide backend matching the model's vocabulary
+        self.backend = get_backend(self.model_config.get("tokenizer"))
         
     def _get_model_config(self) -> Dict[str, Any]:
         """Get the configuration for the current model."""
-        for provider, companies in SUPPORTED_MODELS.items():
-            for company, models in companies.items():
-                for model_id, config in models.items():
-                    if model_id == self.model_name:
-                        return config
-        raise ValueError(f"Model {self.model_name} not found in configuration")
+        return get_model_config(self.model_name)
 
     def count_tokens(self, text: str) -> int:
         """Count the number of tokens in a text string."""
-        return len(self.encoding.encode(text))
+        return self.backend.count(text)
 
-    def count_message_tokens(self, message: Dict[str, str]) -> int:
-        """Count tokens in a message dictionary."""
+    def count_message_tokens(self, message: Dict[str, Any]) -> int:
+        """Count tokens in a message dictionary, reusing the cached count if present."""
+        if "tokens" in message:
+            return message["tokens"]
         content = message.get("content", "")
         role = message.get("role", "")
         return self.count_tokens(f"{role}: {content}")
 
+    def count_many(self, texts: List[str], num_threads: int = None) -> array:
+        """Count tokens for many strings in one batched, multi-threaded call."""
+        return array("l", self.backend.count_batch(list(texts), num_threads=num_threads))
+
+    def count_conversations(self, histories: List[List[Dict[str, Any]]], num_threads: int = None) -> List[array]:
+        """Count per-message tokens for many conversations, returning one compact array per conversation."""
+        histories = list(histories)
+        texts = [
+            f"{msg.get('role', '')}: {msg.get('content', '')}"
+            for messages in histories
+            for msg in messages
+        ]
+        counts = self.count_many(texts, num_threads=num_threads)
+        results = []
+        offset = 0
+        for messages in histories:
+            results.append(counts[offset:offset + len(messages)])
+            offset += len(messages)
+        return results
+
     def count_conversation_tokens(self, messages: List[Dict[str, str]]) -> int:
         """Count total tokens in a conversation."""
         return sum(self.count_message_tokens(msg) for msg in messages)
 
-    def truncate_conversation(self, messages: List[Dict[str, str]], max_tokens: int) -> List[Dict[str, str]]:
-        """Truncate conversation to fit within token limit while preserving the most recent messages."""
-        total_tokens = self.count_conversation_tokens(messages)
-        if total_tokens <= max_tokens:
-            return messages
+    def pinned_prefix_length(self, messages: List[Dict[str, Any]], pin_first_user: bool = False) -> int:
+        """Count the leading messages (system prompts and optionally the first user turn) that are never evicted."""
+        pinned = 0
+        while pinned < len(messages) and messages[pinned]["role"] == "system":
+            pinned += 1
+        if pin_first_user and pinned < len(messages) and messages[pinned]["role"] == "user":
+            pinned += 1
+        return pinned
 
-        # Keep system message if present
-        system_message = next((msg for msg in messages if msg["role"] == "system"), None)
-        
-        # Start with system message if it exists
-        truncated_messages = [system_message] if system_message else []
-        
-        # Add messages from the end until we hit the token limit
-        current_tokens = self.count_conversation_tokens(truncated_messages)
-        for msg in reversed(messages):
-            if msg["role"] == "system":
-                continue
-                
-            msg_tokens = self.count_message_tokens(msg)
-            if current_tokens + msg_tokens > max_tokens:
-                break
-                
-            truncated_messages.insert(1 if system_message else 0, msg)
-            current_tokens += msg_tokens
+    def eviction_range(
+        self,
+        messages: List[Dict[str, Any]],
+        max_tokens: int,
+        total_tokens: int = None,
+        pinned: int = 0
+    ) -> Tuple[int, int]:
+        """Return the [start, end) range of messages to evict from the front so the rest fits within max_tokens.
 
-        return truncated_messages
+        Only the evicted messages are visited, so with a running total each eviction is amortized O(1).
+        The most recent message is always kept.
+        """
+        if total_tokens is None:
+            total_tokens = self.count_conversation_tokens(messages)
+        end = pinned
+        last = len(messages) - 1
+        while total_tokens > max_tokens and end < last:
+            total_tokens -= self.count_message_tokens(messages[end])
+            end += 1
+        return pinned, end
+
+    def truncate_conversation(
+        self,
+        messages: List[Dict[str, Any]],
+        max_tokens: int,
+        pin_first_user: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Truncate conversation to fit within token limit while preserving pinned and the most recent messages."""
+        pinned = self.pinned_prefix_length(messages, pin_first_user)
+        start, end = self.eviction_range(messages, max_tokens, pinned=pinned)
+        if start == end:
+            return messages
+        return messages[:start] + messages[end:]
 
     def get_available_tokens(self, max_tokens: int = None) -> int:
         """Get the available tokens based on model context length and optional max_tokens parameter."""
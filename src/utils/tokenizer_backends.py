@@ -0,0 +1,133 @@
+import logging
+import os
+import math
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Optional
+from ..config.models_config import TOKENIZER_SPECS, DEFAULT_TOKENIZER
+
+logger = logging.getLogger(__name__)
+
+# Local directory holding HuggingFace ``tokenizer.json`` vocabularies, e.g. vocab/llama3/tokenizer.json
+VOCAB_DIR = os.environ.get(
+    "TOKENIZER_VOCAB_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "vocab")
+)
+
+# Estimated tokens per UTF-8 byte beyond the first of each non-ASCII character. BPE vocabularies
+# spend a token or more on a CJK character or emoji, far more than chars_per_token suggests.
+EXTRA_BYTE_TOKENS = 0.7
+
+# Threads beyond the available cores only add contention for batch counting
+DEFAULT_NUM_THREADS = min(8, os.cpu_count() or 1)
+# HuggingFace tokenizers count batches on a process-wide Rayon pool sized once, when it is first used
+os.environ.setdefault("RAYON_NUM_THREADS", str(DEFAULT_NUM_THREADS))
+
+
+class TiktokenBackend:
+    """Exact counts from a tiktoken encoding."""
+
+    def __init__(self, name: str, encoding_name: str):
+        import tiktoken
+        self.name = name
+        self.encoding = tiktoken.get_encoding(encoding_name)
+
+    def count(self, text: str) -> int:
+        """Count the number of tokens in a text string."""
+        return len(self.encoding.encode_ordinary(text))
+
+    def _count_slice(self, texts: List[str]) -> List[int]:
+        encode = self.encoding.encode_ordinary
+        return [len(encode(text)) for text in texts]
+
+    def count_batch(self, texts: List[str], num_threads: Optional[int] = None) -> List[int]:
+        """Count tokens for many strings, splitting them into one contiguous slice per thread.
+
+        tiktoken releases the GIL while encoding, so slices run in parallel without paying
+        executor overhead for every single string.
+        """
+        num_threads = num_threads or DEFAULT_NUM_THREADS
+        if num_threads <= 1 or len(texts) < 2 * num_threads:
+            return self._count_slice(texts)
+        size = -(-len(texts) // num_threads)
+        slices = [texts[i:i + size] for i in range(0, len(texts), size)]
+        with ThreadPoolExecutor(num_threads) as executor:
+            return [count for counts in executor.map(self._count_slice, slices) for count in counts]
+
+
+class HuggingFaceBackend:
+    """Exact counts from a local HuggingFace ``tokenizer.json`` vocabulary."""
+
+    def __init__(self, name: str, path: str):
+        from tokenizers import Tokenizer as HFTokenizer
+        self.name = name
+        self.tokenizer = HFTokenizer.from_file(path)
+
+    def count(self, text: str) -> int:
+        """Count the number of tokens in a text string."""
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def count_batch(self, texts: List[str], num_threads: Optional[int] = None) -> List[int]:
+        """Count tokens for many strings.
+
+        ``num_threads=1`` encodes the strings one by one on the calling thread. Otherwise the
+        batch runs on the library's Rayon pool, whose size is fixed by RAYON_NUM_THREADS
+        (default DEFAULT_NUM_THREADS) when the process first uses it and cannot be changed per
+        call, so other values of ``num_threads`` do not change the parallelism.
+        """
+        if num_threads == 1:
+            encode = self.tokenizer.encode
+            return [len(encode(text, add_special_tokens=False).ids) for text in texts]
+        return [len(encoding.ids) for encoding in self.tokenizer.encode_batch_fast(texts, add_special_tokens=False)]
+
+
+class EstimateBackend:
+    """Calibrated characters-per-token estimate used when no vocabulary is available.
+
+    The calibration holds for mostly-ASCII text; multi-byte characters add EXTRA_BYTE_TOKENS per
+    extra UTF-8 byte so that non-Latin text is overestimated rather than undercounted.
+    """
+
+    def __init__(self, name: str, chars_per_token: float):
+        self.name = name
+        self.chars_per_token = chars_per_token
+
+    def count(self, text: str) -> int:
+        """Estimate the number of tokens in a text string."""
+        extra_bytes = len(text.encode("utf-8")) - len(text)
+        return math.ceil(len(text) / self.chars_per_token + extra_bytes * EXTRA_BYTE_TOKENS)
+
+    def count_batch(self, texts: List[str], num_threads: Optional[int] = None) -> List[int]:
+        """Estimate tokens for many strings."""
+        return [self.count(text) for text in texts]
+
+
+def _load_exact_backend(name: str, spec: dict):
+    """Try the local vocabulary file first, then the tiktoken encoding named in the spec."""
+    vocab_file = spec.get("file")
+    if vocab_file:
+        path = os.path.join(VOCAB_DIR, vocab_file)
+        if os.path.exists(path):
+            try:
+                return HuggingFaceBackend(name, path)
+            except Exception as e:
+                logger.warning("Could not load tokenizer vocabulary %s: %s", path, e)
+    if spec.get("encoding"):
+        try:
+            return TiktokenBackend(name, spec["encoding"])
+        except Exception as e:
+            logger.warning("Could not load tiktoken encoding %s: %s", spec["encoding"], e)
+    return None
+
+
+@lru_cache(maxsize=None)
+def get_backend(name: Optional[str] = None):
+    """Get the tokenizer backend for a ``tokenizer`` spec name, loaded once per process."""
+    name = name or DEFAULT_TOKENIZER
+    if name not in TOKENIZER_SPECS:
+        raise ValueError(f"Tokenizer {name} not found in configuration")
+    spec = TOKENIZER_SPECS[name]
+    backend = _load_exact_backend(name, spec)
+    if backend is None:
+        backend = EstimateBackend(name, spec["chars_per_token"])
+    return backend
@@ -0,0 +1,56 @@
+import importlib
+import logging
+import threading
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# Seconds each warm-up step took, for the startup benchmark and debugging
+warmup_timings: Dict[str, float] = {}
+
+_started = False
+_started_lock = threading.Lock()
+_done = threading.Event()
+
+
+def _warm() -> None:
+    from ..config.models_config import DEFAULT_TOKENIZER
+    from .api_handlers import load_litellm
+    from .tokenizer_backends import get_backend
+
+    steps = (
+        ("litellm", load_litellm),
+        ("http handlers", lambda: importlib.import_module("litellm.llms.custom_httpx.http_handler")),
+        ("tokenizer", lambda: get_backend(DEFAULT_TOKENIZER))
+    )
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            # The step is retried on first use, where its error surfaces
+            logger.warning("Warm-up step %s failed: %s", name, e)
+        warmup_timings[name] = time.perf_counter() - start
+    _done.set()
+
+
+def start_warmup() -> None:
+    """Import LiteLLM and load the default tokenizer on a background thread, once per process.
+
+    Called after the first paint so the API-key screen never waits on these imports; by
+    the time the first message is sent they are usually already loaded.
+    """
+    global _started
+    if _started:
+        return
+    with _started_lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_warm, name="warmup", daemon=True).start()
+
+
+def wait_for_warmup(timeout: float = None) -> bool:
+    """Block until the warm-up has finished; returns False on timeout."""
+    return _done.wait(timeout)
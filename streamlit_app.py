@@ -1,9 +1,11 @@
 # Import required libraries
 import streamlit as st
 import os
-from src.components.model_selector import ModelSelector
-from src.components.chat import ChatInterface
-from src.components.memory import MemoryManager
+import time
+from src.components.session_cache import get_chat_interface, get_comparison_interface, get_model_selector
+from src.components.metrics_panel import render_metrics_panel, render_rerun_profile
+from src.utils.rerun_profiler import get_profiler, profile_section
+from src.utils.warmup import start_warmup
 
 # Page configuration must be the first Streamlit command
 st.set_page_config(
@@ -12,6 +14,7 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
+run_start = time.perf_counter()
 
 # Initial theme styling
 st.markdown("""
@@ -72,7 +75,7 @@ if 'use_custom_groq_key' not in st.session_state:
     st.session_state.use_custom_groq_key = False
 
 # Sidebar
-with st.sidebar:
+with st.sidebar, profile_section("sidebar"):
     st.title("🌸 Chat Assistant")
     
     # API Provider Selection
@@ -194,21 +197,29 @@ with st.sidebar:
             "groq"
         )
         st.write("api_provider:", api_provider, "selector_provider:", selector_provider)
-        model_selector = ModelSelector(selector_provider)
-        model_config = model_selector.render()
+        with profile_section("model selector"):
+            model_config = get_model_selector(selector_provider).render()
         st.session_state["model_config"] = model_config
         if "model_config" in st.session_state:
-            chat_interface = ChatInterface(model_config["model_name"])
+            chat_interface = get_chat_interface(model_config["model_name"])
             chat_interface.memory_manager.render_memory_settings()
+            get_comparison_interface().render_settings(model_config)
     else:
         st.info("Please enter your API key to access the models.", icon="🎀")
 
+    with profile_section("metrics panel"):
+        render_metrics_panel()
+        render_rerun_profile()
+
 # Main chat interface
-if "model_config" in st.session_state:
+if "model_config" in st.session_state and st.session_state.get("comparison_mode"):
+    st.title("Compare Models 💞")
+    get_comparison_interface().render(st.session_state["model_config"])
+elif "model_config" in st.session_state:
     st.title("Chat with Jane 💝")
     
-    # Initialize and render chat interface
-    chat_interface = ChatInterface(st.session_state["model_config"]["model_name"])
+    # Reuse this session's chat interface unless the model or API key changed
+    chat_interface = get_chat_interface(st.session_state["model_config"]["model_name"])
     chat_interface.render()
 else:
     st.title("Welcome to Jane's Chat Space 💖")
@@ -223,3 +234,8 @@ st.markdown("""
         <p style='color: #ffb6c1; font-size: 0.8em;'>Made with Cursor</p>
     </div>
 """, unsafe_allow_html=True)
+
+get_profiler().record("script", time.perf_counter() - run_start)
+
+# The page is painted; load LiteLLM and the tokenizer in the background before the first message
+start_warmup()